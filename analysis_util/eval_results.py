@@ -1,7 +1,9 @@
 import os.path
 import sys
+import numpy as np
 import pandas as pd
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 CURR_DIR = os.path.dirname(os.path.abspath(__file__))
 PARENT_DIR = os.path.dirname(CURR_DIR)
@@ -9,45 +11,140 @@ sys.path.append(PARENT_DIR)
 
 from analysis_v1.solve import solve
 from parametric_solver.solver import NodeContext
+from parametric_solver.result_store import load_result, prefetch_result
+from parametric_solver.apdl_result import linearization_key
 from linearization import linearization
 
 
-def add_lin_results(dict_target, lin_result):
-    dict_target['membrane'] = dict_target.get('membrane', []) + [lin_result['membrane']]
-    dict_target['bending'] = dict_target.get('bending', []) + [lin_result['bending']]
-    dict_target['linearized'] = dict_target.get('linearized', []) + [lin_result['linearized']]
+RESULT_COLUMNS = [
+    'membrane_stress',
+    'bending_stress',
+    'linearized_stress',
+    'membrane_strain',
+    'bending_strain',
+    'linearized_strain'
+]
+# summary value holding the key of the linearization plan with which the result columns were evaluated
+LINEARIZATION_KEY = 'linearization_key'
 
 
-def eval_results(solver, parameters, name_provider, flat, out=None):
+def add_lin_results(dict_target, lin_result, suffix):
+    dict_target[f'membrane_{suffix}'] = lin_result['membrane']
+    dict_target[f'bending_{suffix}'] = lin_result['bending']
+    dict_target[f'linearized_{suffix}'] = lin_result['linearized']
+
+
+def eval_results(solver, parameters, name_provider, flat, out=None, read_cache=True, processes=1, prefetch=4):
+    """
+    Evaluates the maximum linearized stresses and strains of the results of all parameter rows,
+    and writes them with the parameters to a csv file.
+
+    With multiple processes, results are linearized in parallel worker processes, while threads read the result
+    files ahead of the workers. The first result is always evaluated in this process, which computes and persists
+    the linearization plan and interpolation operator of the mesh once. Workers inherit that plan when forked,
+    and otherwise load it from its cache. Summaries are written as the evaluations complete.
+
+    Summaries are stored with the key of the linearization plan, and only read back if the node files, the SCL
+    points, the pairing and the plan version all match. Otherwise, the result is evaluated again.
+
+    Parameters
+    ----------
+    processes: int, optional
+        The number of worker processes. If 1, evaluates all results in this process.
+        If None, uses one process per processor.
+
+    prefetch: int, optional
+        The maximum number of result files read ahead of the workers.
+    """
     if out is None:
         out = os.path.join(CURR_DIR, 'results.frame')
 
     press_bound_df = pd.read_csv(os.path.join(PARENT_DIR, 'inp', 'nodes', 'press_bound.loc'), index_col=0)
     press_bound_nodes = press_bound_df.index.to_numpy()
 
-    stress = {}
-    strain = {}
+    values = np.full((len(parameters), len(RESULT_COLUMNS)), np.nan)
+    pending = []
+    lin_key = linearization_key(flat)
 
-    for index, row in parameters.iterrows():
+    for position, (index, row) in enumerate(parameters.iterrows()):
         name = name_provider(row)
-        result = solver.result_from_name(name)
-        print(f"#{index} Name: {name}")
-        
-        add_lin_results(stress, result.max_linearized_stresses(flat=flat))
-        add_lin_results(strain, result.max_linearized_strains(flat=flat))
-        # stress['eqv'] = stress.get('eqv', []) + [result.max_eqv_stress(nodes=press_bound_nodes)]
-        # strain['eqv'] = strain.get('eqv', []) + [result.max_eqv_strain(nodes=press_bound_nodes)]
-
-    results_df = pd.DataFrame(
-        {
-            'membrane_stress': stress['membrane'],
-            'bending_stress': stress['bending'],
-            'linearized_stress': stress['linearized'],
-            'membrane_strain': strain['membrane'],
-            'bending_strain': strain['bending'],
-            'linearized_strain': strain['linearized']
-        },
-        index=parameters.index
-    )
+
+        # Summaries of previous evaluations with the same linearization are read from the result store's manifest,
+        # so the result itself is only loaded and linearized once.
+        summary = solver.result_summary(name) if read_cache else None
+        if summary is not None and summary.get(LINEARIZATION_KEY) == lin_key \
+                and all(col in summary for col in RESULT_COLUMNS):
+            values[position] = [summary[col] for col in RESULT_COLUMNS]
+            continue
+
+        result_path = solver.result_path(name)
+        if result_path is None:
+            print(f"#{index} Name: {name} has no result. Skipping ...")
+            continue
+
+        pending.append((position, name, result_path))
+
+    print(f"Read {len(parameters) - len(pending)} results from summaries. Evaluating {len(pending)} results ...")
+    start_time = time.time()
+
+    for count, (position, name, result_values) in enumerate(_evaluate_all(pending, flat, processes, prefetch)):
+        print(f"#{parameters.index[position]} Name: {name} ({count + 1}/{len(pending)})")
+        values[position] = result_values
+        solver.update_result_summary(name, **{LINEARIZATION_KEY: lin_key}, **dict(zip(RESULT_COLUMNS, result_values)))
+
+    print(f"Evaluated {len(pending)} results in {time.time() - start_time:.1f} seconds.")
+
+    results_df = pd.DataFrame(values, columns=RESULT_COLUMNS, index=parameters.index)
     results_df = pd.concat([parameters, results_df], axis=1)
-    results_df.to_csv(out)
\ No newline at end of file
+    results_df.to_csv(out)
+
+
+def _evaluate_all(pending, flat, processes, prefetch):
+    if not pending:
+        return
+
+    position, name, result_path = pending[0]
+    yield position, name, _evaluate(result_path, flat)
+
+    if processes == 1:
+        for position, name, result_path in pending[1:]:
+            yield position, name, _evaluate(result_path, flat)
+        return
+
+    workers = processes or os.cpu_count()
+    remaining = iter(pending[1:])
+    fetches = {}
+    evaluations = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor, ThreadPoolExecutor(max_workers=prefetch) as reader:
+        def read_ahead():
+            # Results are only read while fewer than prefetch results wait for a free worker.
+            while len(fetches) < prefetch and len(fetches) + len(evaluations) < workers + prefetch:
+                item = next(remaining, None)
+                if item is None:
+                    return
+                position, name, result_path = item
+                fetches[reader.submit(prefetch_result, result_path)] = (position, name)
+
+        read_ahead()
+        while fetches or evaluations:
+            done, _ = wait(list(fetches) + list(evaluations), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future in fetches:
+                    evaluations[executor.submit(_evaluate, future.result(), flat)] = fetches.pop(future)
+                else:
+                    position, name = evaluations.pop(future)
+                    yield position, name, future.result()
+
+            read_ahead()
+
+
+def _evaluate(result_path, flat):
+    result = load_result(result_path)
+    lin_results = result.linearize_all(flat=flat)
+
+    summary = {}
+    add_lin_results(summary, lin_results['stress'], 'stress')
+    add_lin_results(summary, lin_results['strain'], 'strain')
+    return [float(summary[col]) for col in RESULT_COLUMNS]
@@ -1,6 +1,5 @@
 import os.path
 import sys
-from ansys.mapdl.core.errors import MapdlExitedError
 
 CURR_DIR = os.path.dirname(os.path.abspath(__file__))
 PARENT_DIR = os.path.dirname(CURR_DIR)
@@ -44,12 +43,7 @@ def solve(start=0, end=100):
 
         solver.add_sample(sample)
 
-    while True:
-        try:
-            solver.solve(verbose=True)
-            break
-        except MapdlExitedError:
-            print("MAPDL Exited Error. Continuing ...")
+    solver.solve(verbose=True)
 
     return solver
 
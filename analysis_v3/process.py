@@ -13,10 +13,11 @@ from configs import config_util
 PRESSURES = ['cool-surf1', 'cool-surf2', 'cool-surf3', 'cool-surf4', 'thimble-inner']
 THERMALS = ['jet_matpoint', 'thimble_matpoint']
 
-def process(config, blacklist=[], start=0, end=100):
+def process(config, blacklist=[], start=0, end=100, mapped_pressure=False, processes=None):
     raw_dir = os.path.join(config.INP_BASE_DIR, 'raw')
     press_out_dir = os.path.join(config.PRESS_DIR)
     therm_out_dir = os.path.join(config.THERM_DIR)
+    pressure_loads = []
 
     for i in range(start, end):
         if i in blacklist:
@@ -32,6 +33,8 @@ def process(config, blacklist=[], start=0, end=100):
                 os.makedirs(press_out_dir)
 
             processing.process_pressure(inp_path, out_path)
+            if mapped_pressure:
+                pressure_loads.append((out_path, pressure.replace("-", "_")))
 
         for thermal in THERMALS:
             inp_path = os.path.join(raw_dir, 'thermal', f"{thermal}_idx{i}.out")
@@ -43,6 +46,11 @@ def process(config, blacklist=[], start=0, end=100):
             processing.process_temperature(inp_path, out_path)
             processing.write_temperature_load(out_path, thermal, config.FLAT)
 
+    if pressure_loads:
+        print(f"Mapping {len(pressure_loads)} pressure loads ...")
+        written = processing.write_pressure_loads(pressure_loads, config.FLAT, processes=processes)
+        print(f"Mapped {written} of {len(pressure_loads)} pressure loads.")
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -50,6 +58,9 @@ if __name__ == '__main__':
     parser.add_argument('plastic', type=str)
     parser.add_argument('start', type=int)
     parser.add_argument('end', type=int)
+    parser.add_argument('--mapped-pressure', action='store_true')
+    parser.add_argument('--processes', type=int, default=None)
     args = parser.parse_args()
 
-    process(config_util.get_config(args.shape, args.plastic), blacklist=[], start=args.start, end=args.end)
+    process(config_util.get_config(args.shape, args.plastic), blacklist=[], start=args.start, end=args.end,
+            mapped_pressure=args.mapped_pressure, processes=args.processes)
@@ -13,10 +13,11 @@ from apdl_util import util
 from analysis_v3.configs import config_util 
 
 
-def eval(start, end, config):
+def eval(start, end, config, processes=1):
     parameters = pd.read_csv(config.SOLVE_PARAMS_DIR, index_col=0).iloc[start:end, :]
     solver = solve.solve(config, start=start, end=end)
-    eval_results.eval_results(solver, parameters, config.get_name, config.FLAT, out=config.RESULTS_DIR)
+    eval_results.eval_results(solver, parameters, config.get_name, config.FLAT, out=config.RESULTS_DIR,
+                              processes=processes)
 
 
 if __name__ == '__main__':
@@ -25,6 +26,7 @@ if __name__ == '__main__':
     parser.add_argument('end', type=int)
     parser.add_argument('shape', type=str)
     parser.add_argument('plastic', type=str)
+    parser.add_argument('--processes', type=int, default=1)
     args = parser.parse_args()
 
-    eval(args.start, args.end, config_util.get_config(args.shape, args.plastic))
+    eval(args.start, args.end, config_util.get_config(args.shape, args.plastic), processes=args.processes)
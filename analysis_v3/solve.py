@@ -10,7 +10,7 @@ PARENT_DIR = os.path.dirname(CURR_DIR)
 sys.path.append(PARENT_DIR)
 
 from materials.presets import custom_structural
-from parametric_solver.solver import BilinearThermalSolver, BilinearThermalSample
+from parametric_solver.solver import BilinearThermalSolver, BilinearThermalSample, MAPPED_PRESSURE_EXT
 from parametric_solver.sampling import PropertySampler
 from apdl_util import util
 from analysis_v3.configs import config_util
@@ -81,7 +81,7 @@ def sample_tangent_mod(n):
     return pd.DataFrame(result, columns=['tangent_mod_factor'])
 
 
-def solve(config, start=0, end=None):
+def solve(config, start=0, end=None, instances=1, mapped_pressure=False):
     params_df = pd.read_csv(config.SOLVE_PARAMS_DIR, index_col=0)
 
     if end is None:
@@ -100,7 +100,13 @@ def solve(config, start=0, end=None):
         print(f"Adding row {index}: {sample.name}")
 
         for press in PRESSURES:
-            sample.add_pressure_load(os.path.join(config.PRESS_DIR, f"{press}_idx{row['load_id']:.0f}.out"), press.replace("-", "_"))
+            press_path = os.path.join(config.PRESS_DIR, f"{press}_idx{row['load_id']:.0f}")
+            # Components skipped during pressure mapping are mapped by MAPDL from the pressure file.
+            if mapped_pressure and os.path.exists(press_path + MAPPED_PRESSURE_EXT):
+                press_path += MAPPED_PRESSURE_EXT
+            else:
+                press_path += '.out'
+            sample.add_pressure_load(press_path, press.replace("-", "_"))
         for therm in THERMALS:
             sample.add_thermal_load(os.path.join(config.THERM_DIR, f"{therm}_idx{row['load_id']:.0f}.cdb"))
 
@@ -115,7 +121,7 @@ def solve(config, start=0, end=None):
 
         solver.add_sample(sample)
 
-    solver.solve(verbose=False, kill=True)
+    solver.solve(verbose=False, kill=True, instances=instances)
 
     return solver
 
@@ -126,6 +132,9 @@ if __name__ == '__main__':
     parser.add_argument('plastic', type=str)
     parser.add_argument('start', type=int)
     parser.add_argument('end', type=int)
+    parser.add_argument('--instances', type=int, default=1)
+    parser.add_argument('--mapped-pressure', action='store_true')
     args = parser.parse_args()
 
-    solve(config_util.get_config(args.shape, args.plastic), start=args.start, end=args.end)
+    solve(config_util.get_config(args.shape, args.plastic), start=args.start, end=args.end, instances=args.instances,
+          mapped_pressure=args.mapped_pressure)
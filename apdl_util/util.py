@@ -1,3 +1,4 @@
+import os
 import psutil
 from ansys.mapdl.core import launch_mapdl
 
@@ -14,21 +15,45 @@ def get_mapdl(kill=False, **kwargs):
     return _mapdl
 
 
-def init_mapdl(kill=False, **kwargs):
+def init_mapdl(kill=False, launcher=None, **kwargs):
     if kill:
         kill_ansys()
 
+    if launcher is None:
+        launcher = launch_mapdl
+
     print("Connecting to APDL ...")
-    mapdl_inst = launch_mapdl(**kwargs)
+    mapdl_inst = launcher(**kwargs)
     print("Connected.")
     return mapdl_inst
 
 
+def current_mapdl():
+    """
+    Returns the MAPDL instance of get_mapdl, or None if none was launched since the last clear_mapdl.
+    """
+    return _mapdl
+
+
 def clear_mapdl():
     global _mapdl
     _mapdl = None
 
 
+def exit_mapdl(mapdl_inst, port=None):
+    """
+    Exits a MAPDL instance that may have crashed or hung, and kills any process still listening on its port.
+    """
+    if mapdl_inst is not None:
+        try:
+            mapdl_inst.exit()
+        except Exception as e:
+            print(f"Failed to exit MAPDL: {e}")
+
+    if port is not None:
+        _kill_processes_by_port(port)
+
+
 def kill_ansys():
     print("Killing all ANSYS processes ...")
     _kill_processes_by_name("ANSYS.exe")
@@ -45,4 +70,22 @@ def _kill_processes_by_name(name):
             except psutil.AccessDenied:
                 print(f'Access denied to kill process: {name} with PID: {proc.pid}')
             except Exception as e:
-                print(f'Error occurred while killing process: {name} with PID: {proc.pid}, error: {str(e)}')
\ No newline at end of file
+                print(f'Error occurred while killing process: {name} with PID: {proc.pid}, error: {str(e)}')
+
+
+def _kill_processes_by_port(port):
+    try:
+        connections = psutil.net_connections(kind='inet')
+    except psutil.AccessDenied:
+        print(f'Access denied to list the processes on port {port}')
+        return
+
+    for pid in {conn.pid for conn in connections
+                if conn.pid and conn.pid != os.getpid() and conn.laddr and conn.laddr.port == port}:
+        try:
+            psutil.Process(pid).kill()
+            print(f'Killed process on port {port} with PID: {pid}')
+        except psutil.NoSuchProcess:
+            print(f'No such process on port {port} with PID: {pid}')
+        except psutil.AccessDenied:
+            print(f'Access denied to kill process on port {port} with PID: {pid}')
@@ -0,0 +1,472 @@
+import os
+import sys
+import uuid
+import hashlib
+import numpy as np
+import pandas as pd
+
+CURR_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(CURR_DIR)
+sys.path.append(PARENT_DIR)
+
+from linearization.scl import SCL, gauss_legendre
+from linearization.pair_component_nodes import LSANodePairer, DENSE_PAIRING_LIMIT, SPARSE_PAIRING_CANDIDATES
+from linearization.vinterp import interpolation_matrix, save_interpolation_matrix, load_interpolation_matrix
+from parametric_solver.fingerprint import fingerprints
+
+
+DEFAULT_PLAN_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'parametric_solver', 'linearization')
+PLAN_VERSION = 2
+PAIRINGS = ('auto', 'dense', 'sparse')
+LOCATION_COLUMNS = [1, 2, 3]
+
+_plans = {}
+_pairings = {}
+
+
+class LinearizationPlan:
+    """
+    The mesh-dependent part of a surface linearization.
+
+    Holds the paired nodes of the top and bottom surface, the SCL points between them and the locations of all nodes.
+    None of these depend on the solution, so a plan is computed once per mesh and number of SCL points,
+    and reused to linearize every solution on that mesh.
+    """
+    def __init__(self, top_nodes, top_locations, bottom_nodes, bottom_locations, npoints,
+                 node_ids=None, node_locations=None, quadrature='uniform'):
+        """
+        Parameters
+        ----------
+        top_nodes: np.ndarray
+            The node ids of the top surface, in paired order.
+
+        top_locations: np.ndarray
+            The (n x 3) locations of the top surface nodes, in paired order.
+
+        bottom_nodes: np.ndarray
+            The node ids of the bottom surface, in paired order.
+
+        bottom_locations: np.ndarray
+            The (n x 3) locations of the bottom surface nodes, in paired order.
+
+        npoints: int
+            The number of points on each SCL, or the number of Gauss-Legendre nodes with gauss quadrature.
+
+        node_ids: np.ndarray, optional
+            The ids of all nodes of the mesh.
+
+        node_locations: np.ndarray, optional
+            The (N x 3) locations of all nodes of the mesh, in the order of node_ids.
+
+        quadrature: str, optional
+            'uniform' for evenly spaced SCL points, or 'gauss' for SCL points at the Gauss-Legendre nodes
+            and both surfaces. See linearization.scl.SCL.
+        """
+        self.top_nodes = np.asarray(top_nodes, dtype=int)
+        self.top_locations = np.asarray(top_locations, dtype=float)
+        self.bottom_nodes = np.asarray(bottom_nodes, dtype=int)
+        self.bottom_locations = np.asarray(bottom_locations, dtype=float)
+        self.npoints = int(npoints)
+        self.quadrature = quadrature
+        self.scl_points = SCL(self.top_locations, self.bottom_locations)(self.npoints, flattened=True,
+                                                                         quadrature=quadrature)
+
+        self._node_ids = None
+        self._node_locations = None
+        self._sorter = None
+        self._aligned_ids = None
+        self._aligned_locations = None
+        self._operator = None
+        self.cache_path = None
+        if node_ids is not None:
+            self._set_nodes(node_ids, node_locations)
+
+    @classmethod
+    def build(cls, top_surface_path, bottom_surface_path, all_locs_path=None, npoints=47, quadrature='uniform',
+              pairing='auto'):
+        """
+        Pairs the nodes of the top and bottom surface and reads the locations of all nodes.
+
+        Parameters
+        ----------
+        top_surface_path: str
+            Path to the top surface nodes file.
+
+        bottom_surface_path: str
+            Path to the bottom surface nodes file.
+
+        all_locs_path: str, optional
+            Path to the comma separated locations of all nodes.
+
+        npoints: int, optional
+            The number of points on each SCL, or the number of Gauss-Legendre nodes with gauss quadrature.
+
+        quadrature: str, optional
+            'uniform' or 'gauss'.
+
+        pairing: str, optional
+            'dense' to pair the nodes with the optimal dense assignment, 'sparse' to pair them among their
+            nearest candidates, or 'auto' to pair them sparsely only if the dense distance matrix is too large.
+            See LSANodePairer.default_num_closest.
+        """
+        top_surface_nodes = _read_locations(top_surface_path)
+        bottom_surface_nodes = _read_locations(bottom_surface_path)
+
+        print(f"Pairing nodes of {top_surface_path} and {bottom_surface_path} ...")
+        node_pair = LSANodePairer.from_locations(top_surface_nodes, bottom_surface_nodes)
+        paired_loc = node_pair.pair(num_closest=_num_closest(node_pair, pairing))
+
+        if paired_loc[0, 0] in top_surface_nodes.index:
+            top_nodes, bottom_nodes = paired_loc[:, 0], paired_loc[:, 1]
+        else:
+            top_nodes, bottom_nodes = paired_loc[:, 1], paired_loc[:, 0]
+
+        node_ids = node_locations = None
+        if all_locs_path is not None:
+            all_locs = _read_locations(all_locs_path)
+            node_ids, node_locations = all_locs.index.to_numpy(), all_locs.to_numpy(dtype=float)
+
+        return cls(
+            top_nodes,
+            top_surface_nodes.loc[top_nodes].to_numpy(dtype=float),
+            bottom_nodes,
+            bottom_surface_nodes.loc[bottom_nodes].to_numpy(dtype=float),
+            npoints,
+            node_ids=node_ids,
+            node_locations=node_locations,
+            quadrature=quadrature
+        )
+
+    def with_points(self, npoints, quadrature='uniform'):
+        """
+        Returns
+        -------
+        `:class:`LinearizationPlan
+            A plan with the same paired nodes and node locations, and SCL points for the given number of points
+            and quadrature.
+        """
+        return LinearizationPlan(
+            self.top_nodes,
+            self.top_locations,
+            self.bottom_nodes,
+            self.bottom_locations,
+            npoints,
+            node_ids=self._node_ids,
+            node_locations=self._node_locations,
+            quadrature=quadrature
+        )
+
+    @property
+    def points_per_line(self):
+        """
+        Returns
+        -------
+        int
+            The number of SCL points on each line, including both surfaces.
+        """
+        return self.npoints + 2 if self.quadrature == 'gauss' else self.npoints
+
+    @property
+    def weights(self):
+        """
+        Returns
+        -------
+        np.ndarray
+            The quadrature weights of the SCL points on each line, or None for evenly spaced points.
+        """
+        return gauss_legendre(self.npoints)[1] if self.quadrature == 'gauss' else None
+
+    @property
+    def paired(self):
+        """
+        Returns
+        -------
+        np.ndarray
+            The (n x 2) paired node ids of the top and bottom surface.
+        """
+        return np.column_stack([self.top_nodes, self.bottom_nodes])
+
+    def paired_locations(self):
+        """
+        Returns
+        -------
+        Tuple[pd.DataFrame, pd.DataFrame]
+            The node locations of the top and bottom surface, sorted according to the pairing.
+        """
+        return (
+            pd.DataFrame(self.top_locations, index=self.top_nodes, columns=LOCATION_COLUMNS),
+            pd.DataFrame(self.bottom_locations, index=self.bottom_nodes, columns=LOCATION_COLUMNS)
+        )
+
+    def locations(self, node_ids):
+        """
+        Parameters
+        ----------
+        node_ids: np.ndarray
+            The ids of the nodes of a solution.
+
+        Returns
+        -------
+        np.ndarray
+            The locations of the given nodes, in the given order.
+            The alignment of the last requested node ids is cached, since the solutions on a mesh share their nodes.
+        """
+        if self._node_ids is None:
+            raise ValueError("Linearization plan was built without node locations.")
+
+        node_ids = np.asarray(node_ids, dtype=int)
+        if self._aligned_ids is not None and np.array_equal(node_ids, self._aligned_ids):
+            return self._aligned_locations
+
+        positions = np.searchsorted(self._node_ids, node_ids, sorter=self._sorter)
+        positions = np.minimum(positions, len(self._node_ids) - 1)
+        indices = self._sorter[positions]
+        missing = self._node_ids[indices] != node_ids
+        if np.any(missing):
+            raise KeyError(f"Nodes missing from node locations: {node_ids[missing][:10].tolist()}")
+
+        self._aligned_ids = node_ids.copy()
+        self._aligned_locations = self._node_locations[indices]
+        self._operator = None
+        return self._aligned_locations
+
+    def interpolation_operator(self, node_ids):
+        """
+        Parameters
+        ----------
+        node_ids: np.ndarray
+            The ids of the nodes of a solution.
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            The (n_scl_points x n_nodes) matrix that interpolates values at the given nodes to the SCL points.
+            The matrix of the last requested node ids is cached, and persisted next to the plan if the plan was
+            loaded with get_plan.
+        """
+        self.locations(node_ids)
+        if self._operator is not None:
+            return self._operator
+
+        operator_path = None
+        if self.cache_path is not None:
+            digest = hashlib.sha256(np.ascontiguousarray(self._aligned_ids).tobytes()).hexdigest()[:16]
+            operator_path = f"{os.path.splitext(self.cache_path)[0]}.{digest}.operator.npz"
+
+        if operator_path is not None and os.path.exists(operator_path):
+            try:
+                self._operator = load_interpolation_matrix(operator_path)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable interpolation operator {operator_path}: {e}")
+
+        if self._operator is None:
+            print(f"Computing interpolation operator for {len(self._aligned_ids)} nodes ...")
+            self._operator = interpolation_matrix(self._aligned_locations, self.scl_points)
+            if operator_path is not None:
+                try:
+                    _save_atomic(operator_path, lambda f: save_interpolation_matrix(f, self._operator))
+                except OSError as e:
+                    print(f"Failed to write interpolation operator {operator_path}: {e}")
+
+        return self._operator
+
+    def interpolate(self, node_ids, values):
+        """
+        Interpolates nodal values to the SCL points.
+
+        Parameters
+        ----------
+        node_ids: np.ndarray
+            The ids of the nodes at which the values are given.
+
+        values: np.ndarray
+            The (n_nodes x d) values at the given nodes.
+
+        Returns
+        -------
+        np.ndarray
+            The (n_scl_points x d) values at the SCL points.
+        """
+        values = np.asarray(values)
+        if values.ndim == 1:
+            values = values[:, None]
+
+        return self.interpolation_operator(node_ids) @ values
+
+    def save(self, path):
+        """
+        Writes the plan to a .npz file.
+        """
+        arrays = {
+            'version': np.array(PLAN_VERSION),
+            'npoints': np.array(self.npoints),
+            'quadrature': np.array(self.quadrature),
+            'top_nodes': self.top_nodes,
+            'top_locations': self.top_locations,
+            'bottom_nodes': self.bottom_nodes,
+            'bottom_locations': self.bottom_locations
+        }
+        if self._node_ids is not None:
+            arrays['node_ids'] = self._node_ids
+            arrays['node_locations'] = self._node_locations
+
+        _save_atomic(path, lambda f: np.savez(f, **arrays))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a plan written with save.
+        """
+        with np.load(path) as data:
+            if int(data['version']) != PLAN_VERSION:
+                raise ValueError(f"Unsupported linearization plan version {int(data['version'])} in {path}.")
+
+            return cls(
+                data['top_nodes'],
+                data['top_locations'],
+                data['bottom_nodes'],
+                data['bottom_locations'],
+                int(data['npoints']),
+                node_ids=data['node_ids'] if 'node_ids' in data else None,
+                node_locations=data['node_locations'] if 'node_locations' in data else None,
+                quadrature=str(data['quadrature']) if 'quadrature' in data else 'uniform'
+            )
+
+    def _set_nodes(self, node_ids, node_locations):
+        self._node_ids = np.asarray(node_ids, dtype=int)
+        self._node_locations = np.asarray(node_locations, dtype=float)
+        self._sorter = np.argsort(self._node_ids, kind='stable')
+
+
+def get_plan(top_surface_path, bottom_surface_path, all_locs_path=None, npoints=47, cache_dir=None,
+             quadrature='uniform', pairing='auto'):
+    """
+    Returns the linearization plan of the given surfaces, computing it only if it was not computed before.
+
+    Plans are kept in memory, and persisted in the cache directory under a key derived from the checksums
+    of the given files, the number of points and the pairing, so a plan is recomputed only when a file changes.
+
+    Parameters
+    ----------
+    top_surface_path: str
+        Path to the top surface nodes file.
+
+    bottom_surface_path: str
+        Path to the bottom surface nodes file.
+
+    all_locs_path: str, optional
+        Path to the comma separated locations of all nodes.
+
+    npoints: int, optional
+        The number of points on each SCL, or the number of Gauss-Legendre nodes with gauss quadrature.
+
+    cache_dir: str, optional
+        The directory in which plans are persisted. Defaults to the directory in the environment variable
+        PARAMETRIC_SOLVER_PLANS, or ~/.cache/parametric_solver/linearization.
+
+    quadrature: str, optional
+        'uniform' or 'gauss'.
+
+    pairing: str, optional
+        'auto', 'dense' or 'sparse'. See LinearizationPlan.build.
+
+    Returns
+    -------
+    `:class:`LinearizationPlan
+    """
+    key = plan_key(top_surface_path, bottom_surface_path, all_locs_path, npoints, quadrature, pairing)
+    if key in _plans:
+        return _plans[key]
+
+    if cache_dir is None:
+        cache_dir = os.environ.get('PARAMETRIC_SOLVER_PLANS', DEFAULT_PLAN_DIR)
+
+    plan_path = os.path.join(cache_dir, f"{key}.npz")
+    plan = None
+    if os.path.exists(plan_path):
+        try:
+            plan = LinearizationPlan.load(plan_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable linearization plan {plan_path}: {e}")
+
+    # plans of the same surfaces with other SCL points share their pairing
+    pairing_key = plan_key(top_surface_path, bottom_surface_path, all_locs_path, None, pairing=pairing)
+    if plan is None and pairing_key in _pairings:
+        plan = _pairings[pairing_key].with_points(npoints, quadrature)
+        try:
+            plan.save(plan_path)
+        except OSError as e:
+            print(f"Failed to write linearization plan {plan_path}: {e}")
+
+    if plan is None:
+        plan = LinearizationPlan.build(top_surface_path, bottom_surface_path, all_locs_path, npoints, quadrature,
+                                       pairing)
+        try:
+            plan.save(plan_path)
+        except OSError as e:
+            print(f"Failed to write linearization plan {plan_path}: {e}")
+
+    plan.cache_path = plan_path
+    _pairings.setdefault(pairing_key, plan)
+
+    _plans[key] = plan
+    return plan
+
+
+def plan_key(top_surface_path, bottom_surface_path, all_locs_path=None, npoints=47, quadrature='uniform',
+             pairing='auto'):
+    """
+    Returns
+    -------
+    str
+        The key of the linearization plan of the given files, number of points and pairing.
+        The pairing limits are part of the key, since they decide between the dense and sparse pairing.
+    """
+    digest = hashlib.sha256()
+    for path in [top_surface_path, bottom_surface_path, all_locs_path]:
+        digest.update((fingerprints.checksum(path) if path is not None else '').encode())
+    digest.update(str(npoints).encode())
+    if quadrature != 'uniform':
+        digest.update(quadrature.encode())
+    digest.update(f"v{PLAN_VERSION}:{_pairing_token(pairing)}".encode())
+    return digest.hexdigest()[:32]
+
+
+def _num_closest(node_pair, pairing):
+    if pairing == 'auto':
+        return node_pair.default_num_closest()
+    if pairing == 'dense':
+        return None
+    if pairing == 'sparse':
+        return SPARSE_PAIRING_CANDIDATES
+
+    raise ValueError(f"Unknown pairing {pairing}, expected one of {PAIRINGS}.")
+
+
+def _pairing_token(pairing):
+    if pairing == 'auto':
+        return f"auto:{DENSE_PAIRING_LIMIT}:{SPARSE_PAIRING_CANDIDATES}"
+    if pairing == 'sparse':
+        return f"sparse:{SPARSE_PAIRING_CANDIDATES}"
+    if pairing == 'dense':
+        return 'dense'
+
+    raise ValueError(f"Unknown pairing {pairing}, expected one of {PAIRINGS}.")
+
+
+def _save_atomic(path, write):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            write(f)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _read_locations(path):
+    df = pd.read_csv(path, index_col=0, header=None)
+    df.index = df.index.astype(int)
+    return df
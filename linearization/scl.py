@@ -110,6 +110,20 @@ class SCL_APDLFile:
         return title, pd.Series(data)
 
 
+def gauss_legendre(npoints: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    the npoints Gauss-Legendre nodes on [-1, 1] and their weights, with both end points
+    added with zero weight so peak values at the surfaces remain available
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        the npoints + 2 normalized positions and weights
+    """
+    xi, weights = np.polynomial.legendre.leggauss(npoints)
+    return np.concatenate([[-1.0], xi, [1.0]]), np.concatenate([[0.0], weights, [0.0]])
+
+
 class SCL:
     """
     SCL
@@ -120,6 +134,9 @@ class SCL:
     as a nxdxp array where n is the number of nodes, and p is the number of points, and d is the dimension
 
     or if flattened output is requested it is returned as a (n*p)xd array
+
+    with quadrature='gauss', the points are placed at the npoints Gauss-Legendre nodes
+    and at both ends of each line, so p is npoints + 2
     """
 
     def __init__(self,
@@ -129,10 +146,17 @@ class SCL:
         self.x1 = _at_least2d(x1)
         self.x2 = _at_least2d(x2)
         self.scl = None
+        self._scl_key = None
 
-    def _make_scl(self, npoints: int):
+    def _make_scl(self, npoints: int, quadrature='uniform'):
         vec = self.x2 - self.x1
-        dim3 = np.linspace(0, 1, npoints)
+        if quadrature == 'gauss':
+            dim3 = (gauss_legendre(npoints)[0] + 1.0) / 2.0
+            npoints = dim3.shape[0]
+        elif quadrature == 'uniform':
+            dim3 = np.linspace(0, 1, npoints)
+        else:
+            raise ValueError(f"Unknown quadrature '{quadrature}'.")
 
         self.scl = np.multiply.outer(vec, dim3).reshape(vec.shape[0], vec.shape[1], npoints) \
                    + self.x1[..., None]
@@ -140,10 +164,12 @@ class SCL:
         self.scl = self.scl.swapaxes(-1, -2)
 
     def __call__(self, npoints: int,
-                 flattened=False) -> np.ndarray:
+                 flattened=False,
+                 quadrature='uniform') -> np.ndarray:
 
-        if self.scl is None:
-            self._make_scl(npoints)
+        if self.scl is None or self._scl_key != (npoints, quadrature):
+            self._make_scl(npoints, quadrature=quadrature)
+            self._scl_key = (npoints, quadrature)
 
         if flattened:
             return self.scl.swapaxes(-1, 2). \
@@ -14,6 +14,7 @@ from linearization.vinterp import interpolate_nodal_values
 from linearization.linearization import APDLIntegrate
 from linearization.scl import SCL
 from linearization.pair_component_nodes import LSANodePairer
+from linearization.plan import get_plan
 
 
 def pair_nodes(write_path: pathlib.PurePath, top_surface_path: str, bottom_surface_path: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
@@ -51,7 +52,7 @@ def pair_nodes(write_path: pathlib.PurePath, top_surface_path: str, bottom_surfa
     # top_surface_nodes.to_csv(os.path.join(CURR_DIR, 'top_debug.csv'))
     # bottom_surface_nodes.to_csv(os.path.join(CURR_DIR, 'bot_debug.csv'))
 
-    paired_loc = node_pair.pair()
+    paired_loc = node_pair.pair(num_closest=node_pair.default_num_closest())
     # np.savetxt(os.path.join(CURR_DIR, 'paired.np'), paired_loc, delimiter=",")
 
     if paired_loc[0, 0] in top_surface_nodes.index:
@@ -73,7 +74,9 @@ def linearize_stresses(write_path: pathlib.PurePath,
                        node_sol: pd.DataFrame,
                        all_locs: str,
                        npoints: int,
-                       strain) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+                       strain,
+                       plan=None,
+                       metrics=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
     Linearize stress fields according to the guidelines provided in ASME
     code/ITER SDC document
@@ -98,6 +101,14 @@ def linearize_stresses(write_path: pathlib.PurePath,
     npoints: int
         the number of integration points to interpolate the stress tresults to
 
+    plan: LinearizationPlan, optional
+        the linearization plan of the surfaces. If provided, its SCL points, quadrature and interpolation
+        operator are reused instead of reading all_locs and triangulating all nodes, and npoints is ignored.
+
+    metrics: Iterable[str], optional
+        the metrics to compute and save, any of 'membrane', 'bending', 'peak', 'principal'
+        and 'triaxility_factor'. if None, computes all of them. the location is always returned
+
     Returns
     -------
     Dict[membrane: np.ndarray,
@@ -108,40 +119,36 @@ def linearize_stresses(write_path: pathlib.PurePath,
     at all intermediate poitns on the plane between the two boundaries
     """
 
-    scl_apdl = SCL(loc1.to_numpy(), loc2.to_numpy())
-    scl_points = scl_apdl(npoints, flattened=True)
-    
-    node_loc = pd.read_csv(all_locs, index_col=0, header=None)
-    node_loc = node_loc.loc[node_sol.index]
+    weights = None
+    if plan is not None:
+        scl_points = plan.scl_points
+        scl_sol = plan.interpolate(node_sol.index.to_numpy(), node_sol.to_numpy())
+        npoints = plan.points_per_line
+        weights = plan.weights
+    else:
+        scl_apdl = SCL(loc1.to_numpy(), loc2.to_numpy())
+        scl_points = scl_apdl(npoints, flattened=True)
+
+        node_loc = pd.read_csv(all_locs, index_col=0, header=None)
+        node_loc = node_loc.loc[node_sol.index]
 
-    scl_sol = interpolate_nodal_values(node_loc.to_numpy(),
-                                       node_sol.to_numpy(),
-                                       scl_points)
+        scl_sol = interpolate_nodal_values(node_loc.to_numpy(),
+                                           node_sol.to_numpy(),
+                                           scl_points)
     
-    apdl_int = APDLIntegrate(scl_sol, scl_points, npoints)
-    membrane = apdl_int.membrane_vm(averaged=True, strain=strain)
-    bending = apdl_int.bending_vm(averaged=True, strain=strain)
-    peak = apdl_int.peak_vm(averaged=True)
-    principal = apdl_int.linearized_principal_stress(averaged=True)
-    triaxility_factor = apdl_int.triaxiality_factor(averaged=True)
-    location = (loc1.to_numpy() + loc2.to_numpy()) / 2
+    apdl_int = APDLIntegrate(scl_sol, scl_points, npoints, weights=weights)
+    results = apdl_int.compute(metrics=metrics, strain=strain)
+    results['location'] = (loc1.to_numpy() + loc2.to_numpy()) / 2
 
     if write_path is not None:
-        for a, name in zip([membrane, bending, peak, location, principal, triaxility_factor],
-                           ['membrane', 'bending', 'peak', 'location', 'principal', 'triaxility_factor']):
+        for name, a in results.items():
             np.save(str(write_path.joinpath(name + '.npy')), a)
 
-    return {
-        'membrane': membrane,
-        'bending': bending,
-        'peak': peak,
-        'location': location,
-        'principal': principal,
-        'triaxility_factor': triaxility_factor
-    }
+    return results
 
 
-def linearize_surface(top_surface_path, bottom_surface_path, solution, all_locs_path, write_path, strain, npoints=47):
+def linearize_surface(top_surface_path, bottom_surface_path, solution, all_locs_path, write_path, strain, npoints=47,
+                      quadrature='uniform', metrics=None):
     platform = str(sys.platform)
     if platform == 'unix' or platform == 'posix' or platform == 'linux':
         _path = pathlib.PosixPath
@@ -150,5 +157,151 @@ def linearize_surface(top_surface_path, bottom_surface_path, solution, all_locs_
 
     write_path = None if write_path is None else _path(write_path)
 
-    loc1, loc2 = pair_nodes(write_path, top_surface_path, bottom_surface_path)
-    return linearize_stresses(write_path, loc1, loc2, solution, all_locs_path, npoints, strain)
+    plan = get_plan(top_surface_path, bottom_surface_path, all_locs_path, npoints, quadrature=quadrature)
+    if write_path is not None:
+        np.save(str(write_path.joinpath('paired.npy')), plan.paired)
+
+    loc1, loc2 = plan.paired_locations()
+    return linearize_stresses(write_path, loc1, loc2, solution, all_locs_path, npoints, strain, plan=plan,
+                              metrics=metrics)
+
+
+def linearize_fields(top_surface_path, bottom_surface_path, solutions, all_locs_path, strains, npoints=47,
+                     quadrature='uniform', metrics=None):
+    """
+    Linearizes several fields on the same surfaces in one pass. Fields given at the same nodes
+    are interpolated to the SCL points with a single interpolation of all their columns, and
+    fields with the same number of columns are integrated as one batch.
+
+    Parameters
+    ----------
+    solutions: List[pd.DataFrame]
+        the values of each field at all nodes, e.g. the stresses and strains of a result
+
+    strains: List[bool]
+        per field, whether it is a strain field
+
+    metrics: Iterable[str], optional
+        the metrics to compute. see linearize_stresses
+
+    Returns
+    -------
+    List[dict]
+        the linearization results of each field, as returned by linearize_stresses
+    """
+    plan = get_plan(top_surface_path, bottom_surface_path, all_locs_path, npoints, quadrature=quadrature)
+    loc1, loc2 = plan.paired_locations()
+    location = (loc1.to_numpy() + loc2.to_numpy()) / 2
+
+    node_ids = solutions[0].index.to_numpy()
+    if all(np.array_equal(node_ids, solution.index.to_numpy()) for solution in solutions[1:]):
+        scl_sol = plan.interpolate(node_ids, np.hstack([solution.to_numpy() for solution in solutions]))
+        splits = np.cumsum([solution.shape[1] for solution in solutions])[:-1]
+        scl_sols = np.split(scl_sol, splits, axis=1)
+    else:
+        scl_sols = [plan.interpolate(solution.index.to_numpy(), solution.to_numpy()) for solution in solutions]
+
+    if all(scl_sol.shape == scl_sols[0].shape for scl_sol in scl_sols):
+        apdl_int = APDLIntegrate(np.stack(scl_sols), plan.scl_points, plan.points_per_line, weights=plan.weights)
+        batches = [(apdl_int, k) for k in range(len(scl_sols))]
+    else:
+        batches = [(APDLIntegrate(scl_sol, plan.scl_points, plan.points_per_line, weights=plan.weights), None)
+                   for scl_sol in scl_sols]
+
+    results = []
+    for (apdl_int, k), strain in zip(batches, strains):
+        result = apdl_int.compute(metrics=metrics, strain=strain)
+        if k is not None:
+            result = {metric: values[k] for metric, values in result.items()}
+        result['location'] = location
+        results.append(result)
+
+    return results
+
+
+def quadrature_report(top_surface_path, bottom_surface_path, solution, all_locs_path=None, strain=False,
+                      orders=(3, 5, 7, 9), baseline=47) -> pd.DataFrame:
+    """
+    compares the linearized values of Gauss-Legendre quadrature of the given orders
+    against evenly spaced SCL points with trapezoid/simpson integration
+
+    Parameters
+    ----------
+    solution: Union[pd.DataFrame, Callable]
+        stress or strain values at all nodes, which are interpolated to the SCL points,
+        or a function returning the values at an (n x 3) array of SCL points
+
+    all_locs_path: str
+        path to the locations of all nodes. required if solution is a dataframe
+
+    orders: Iterable[int]
+        the numbers of Gauss-Legendre nodes to compare
+
+    baseline: int
+        the number of evenly spaced points of the reference
+
+    Returns
+    -------
+    pd.DataFrame
+        per order, the number of SCL points, the maximum error of the membrane, bending and
+        membrane + bending values relative to the maximum reference value, and the relative error
+        of their maxima
+    """
+    if not callable(solution) and all_locs_path is None:
+        raise ValueError("all_locs_path is required to interpolate a solution given at the nodes.")
+
+    def linearize(plan):
+        if callable(solution):
+            scl_sol = solution(plan.scl_points)
+        else:
+            scl_sol = plan.interpolate(solution.index.to_numpy(), solution.to_numpy())
+
+        apdl_int = APDLIntegrate(scl_sol, plan.scl_points, plan.points_per_line, weights=plan.weights)
+        return apdl_int.compute(['membrane', 'bending'], strain=strain)
+
+    reference = linearize(get_plan(top_surface_path, bottom_surface_path, all_locs_path, baseline))
+
+    rows = []
+    for order in orders:
+        result = linearize(get_plan(top_surface_path, bottom_surface_path, all_locs_path, order, quadrature='gauss'))
+        row = {'order': order, 'points': order + 2}
+        for name, ref, val in [
+            ('membrane', reference['membrane'], result['membrane']),
+            ('bending', reference['bending'], result['bending']),
+            ('linearized', reference['membrane'] + reference['bending'], result['membrane'] + result['bending'])
+        ]:
+            scale = np.abs(ref).max()
+            row[f'{name}_error'] = np.abs(val - ref).max() / scale
+            row[f'{name}_max_error'] = abs(val.max() - ref.max()) / scale
+        rows.append(row)
+
+    return pd.DataFrame(rows).set_index('order')
+
+
+def main():
+    nodes_dir = os.path.join(PARENT_DIR, 'inp', 'nodes')
+    top_surface_path = os.path.join(nodes_dir, 'ts_flat.node.loc')
+    bottom_surface_path = os.path.join(nodes_dir, 'bs_flat.node.loc')
+
+    # smooth synthetic stress field varying across the radial thickness of the flat geometry,
+    # with a steep gradient at the inner surface
+    def solution(points):
+        r = np.linalg.norm(points[:, :2], axis=1)
+        r = (r - r.min()) / np.ptp(r)
+        return np.column_stack([
+            100 + 50 * r + 30 * np.exp(-10 * r),
+            80 - 40 * r ** 2,
+            60 * np.cos(3 * r),
+            10 * np.sin(2 * r + points[:, 2]),
+            5 * r * points[:, 1],
+            20 * (1 - r) ** 3
+        ])
+
+    start = time.time()
+    report = quadrature_report(top_surface_path, bottom_surface_path, solution)
+    print(report.to_string())
+    print(f"Report computed in {time.time() - start:.1f} seconds.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,9 @@
 import pandas as pd
 from scipy.interpolate import LinearNDInterpolator, NearestNDInterpolator
+from scipy.spatial import Delaunay, cKDTree
+from scipy import sparse
 import numpy as np
+import itertools
 import argparse
 import os
 
@@ -48,6 +51,171 @@ def interpolate_nodal_values(xin: np.ndarray,
     return values_out
 
 
+def interpolation_matrix(xin: np.ndarray,
+                         xout: np.ndarray) -> sparse.csr_matrix:
+    """
+    the linear operator of interpolate_nodal_values, as a sparse matrix.
+
+    the barycentric weights of every point in xout are computed once on the rescaled
+    delaunay triangulation of xin, as in scipy's LinearNDInterpolator. points outside of
+    the triangulation get a single unit weight at their nearest input point, as in
+    NearestNDInterpolator. interpolating any values at xin is then a single product with
+    the matrix, so the operator can be reused for every field on the same locations.
+    xin should span a volume. for points on a surface, see surface_interpolation_matrix.
+
+    Parameters
+    ----------
+    xin: np.ndarray
+        the (n_in x d) locations to interpolate at
+    xout: np.ndarray
+        the (n_out x d) locations to interpolate the provided values to
+
+    Returns
+    --------
+    sparse.csr_matrix
+        the (n_out x n_in) interpolation matrix
+    """
+
+    xin = np.asarray(xin, dtype=float)
+    xout = np.asarray(xout, dtype=float)
+    n_out, ndim = xout.shape
+
+    # rescale both point sets to the unit cube of the input points, as done with rescale=True
+    offset = np.mean(xin, axis=0)
+    scale = np.ptp(xin - offset, axis=0)
+    scale[~(scale > 0)] = 1.0
+    xin = (xin - offset) / scale
+    xout = (xout - offset) / scale
+
+    tri = Delaunay(xin)
+    simplex = tri.find_simplex(xout, tol=100 * np.finfo(float).eps)
+    inside = simplex >= 0
+
+    transform = tri.transform[simplex[inside]]
+    bary = np.einsum('ijk,ik->ij', transform[:, :ndim, :], xout[inside] - transform[:, ndim, :])
+    bary = np.column_stack([bary, 1 - bary.sum(axis=1)])
+
+    _, nearest = cKDTree(xin).query(xout[~inside])
+
+    rows = np.concatenate([np.repeat(np.flatnonzero(inside), ndim + 1), np.flatnonzero(~inside)])
+    cols = np.concatenate([tri.simplices[simplex[inside]].ravel(), nearest])
+    weights = np.concatenate([bary.ravel(), np.ones(len(nearest))])
+
+    return sparse.csr_matrix((weights, (rows, cols)), shape=(n_out, xin.shape[0]))
+
+
+SURFACE_NEIGHBORS = (8, 16)
+SURFACE_CHUNK_SIZE = 2 ** 20
+
+
+def surface_interpolation_matrix(xin: np.ndarray,
+                                 xout: np.ndarray,
+                                 num_neighbors: tuple = SURFACE_NEIGHBORS) -> sparse.csr_matrix:
+    """
+    the linear interpolation operator of values on a surface, as a sparse matrix.
+
+    points on a surface span a degenerate volume, so a delaunay triangulation of them
+    in 3d leaves almost every point of xout outside of the hull, and interpolation_matrix
+    falls back to the nearest input point. instead, the nearest input points of every
+    point in xout are projected onto their local tangent plane. of the triangles between
+    these neighbors that contain the projected point, the most compact one supplies the
+    barycentric weights. points without a containing triangle, i.e. beyond the boundary
+    of the input surface, get a single unit weight at their nearest input point.
+
+    Parameters
+    ----------
+    xin: np.ndarray
+        the (n_in x 3) locations on the surface to interpolate at
+    xout: np.ndarray
+        the (n_out x 3) locations on the surface to interpolate the provided values to
+    num_neighbors: tuple, optional
+        the increasing numbers of nearest input points forming the triangles around each point in xout.
+        points without a containing triangle are retried with the next number of neighbors.
+
+    Returns
+    --------
+    sparse.csr_matrix
+        the (n_out x n_in) interpolation matrix. rows of points inside a triangle
+        hold three entries, rows of nearest points a single one.
+    """
+
+    xin = np.asarray(xin, dtype=float)
+    xout = np.asarray(xout, dtype=float)
+    n_out = xout.shape[0]
+    tree = cKDTree(xin)
+
+    vertices = np.zeros((n_out, 3), dtype=int)
+    bary = np.zeros((n_out, 3))
+    inside = np.zeros(n_out, dtype=bool)
+
+    for k in num_neighbors:
+        k = min(k, xin.shape[0])
+        pending = np.flatnonzero(~inside)
+        triangles = np.array(list(itertools.combinations(range(k), 3)))
+        _, neighbors = tree.query(xout[pending], k=k)
+        neighbors = neighbors.reshape(len(pending), k)
+        chunk_size = max(1, SURFACE_CHUNK_SIZE // len(triangles))
+
+        for start in range(0, len(pending), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            chunk_vertices, chunk_bary, chunk_inside = _surface_triangles(xin[neighbors[chunk]],
+                                                                          xout[pending[chunk]], triangles)
+            vertices[pending[chunk]] = np.take_along_axis(neighbors[chunk], chunk_vertices, axis=1)
+            bary[pending[chunk]] = chunk_bary
+            inside[pending[chunk]] = chunk_inside
+
+    _, nearest = tree.query(xout[~inside])
+    rows = np.concatenate([np.repeat(np.flatnonzero(inside), 3), np.flatnonzero(~inside)])
+    cols = np.concatenate([vertices[inside].ravel(), nearest])
+    weights = np.concatenate([bary[inside].ravel(), np.ones(len(nearest))])
+
+    return sparse.csr_matrix((weights, (rows, cols)), shape=(n_out, xin.shape[0]))
+
+
+def _surface_triangles(points, xout, triangles, tol=1e-9):
+    # project the neighbors and the interpolated point onto the plane of least squares of the neighbors
+    centroid = points.mean(axis=1)
+    _, _, vt = np.linalg.svd(points - centroid[:, None, :], full_matrices=False)
+    tangents = vt[:, :2, :]
+    uv = np.einsum('nkd,njd->nkj', points - centroid[:, None, :], tangents)
+    q = np.einsum('nd,njd->nj', xout - centroid, tangents)
+
+    a, b, c = (uv[:, triangles[:, i], :] for i in range(3))
+    ab, ac, aq = b - a, c - a, q[:, None, :] - a
+    det = ab[..., 0] * ac[..., 1] - ac[..., 0] * ab[..., 1]
+
+    # triangles of (nearly) collinear neighbors have no meaningful weights
+    extent = np.max(np.sum(uv ** 2, axis=-1), axis=1)
+    valid = np.abs(det) > 1e-6 * extent[:, None]
+    det = np.where(valid, det, 1.0)
+
+    l1 = (aq[..., 0] * ac[..., 1] - ac[..., 0] * aq[..., 1]) / det
+    l2 = (ab[..., 0] * aq[..., 1] - aq[..., 0] * ab[..., 1]) / det
+    l0 = 1 - l1 - l2
+    valid &= (l0 >= -tol) & (l1 >= -tol) & (l2 >= -tol)
+
+    size = np.sum(ab ** 2, axis=-1) + np.sum(ac ** 2, axis=-1) + np.sum((c - b) ** 2, axis=-1)
+    best = np.argmin(np.where(valid, size, np.inf), axis=1)
+    rows = np.arange(len(points))
+
+    bary = np.column_stack([l0[rows, best], l1[rows, best], l2[rows, best]])
+    return triangles[best], bary, valid[rows, best]
+
+
+def save_interpolation_matrix(file: str, matrix: sparse.csr_matrix) -> None:
+    """
+    write an interpolation matrix to a .npz file
+    """
+    sparse.save_npz(file, matrix)
+
+
+def load_interpolation_matrix(file: str) -> sparse.csr_matrix:
+    """
+    read an interpolation matrix written with save_interpolation_matrix
+    """
+    return sparse.load_npz(file).tocsr()
+
+
 def interpolate_nodal_temperatures(df_in: pd.DataFrame,
                                    mesh_nodes: pd.DataFrame) -> pd.DataFrame:
     """
@@ -1,9 +1,12 @@
 import os.path
 import sys
+import uuid
+import shutil
 import math
+import json
+import functools
 import numpy as np
 import pandas as pd
-import time
 
 CURR_DIR = os.path.dirname(os.path.abspath(__file__))
 PARENT_DIR = os.path.dirname(CURR_DIR)
@@ -11,6 +14,7 @@ sys.path.append(PARENT_DIR)
 
 import linearization.surface as surface
 import linearization.linearization as linearization
+from linearization.plan import plan_key
 
 
 NODES_DIR = os.path.join(PARENT_DIR, 'inp', 'nodes')
@@ -22,16 +26,60 @@ _FLAT_TOP_SURFACE_PATH = os.path.join(NODES_DIR, 'ts_flat.node.loc')
 _FLAT_BOTTOM_SURFACE_PATH = os.path.join(NODES_DIR, 'bs_flat.node.loc')
 _FLAT_ALL_LOCS_PATH = os.path.join(NODES_DIR, 'all_flat.node.loc')
 
+STRESS_COLUMNS = ["X", "Y", "Z", "XY", "YZ", "XZ"]
+STRAIN_COLUMNS = ["X", "Y", "Z", "XY", "YZ", "XZ", "EQV"]
+DISPLACEMENT_COLUMNS = ["X", "Y", "Z"]
+
+RESULT_FORMAT = 'APDLResult'
+RESULT_FORMAT_VERSION = 1
+RESULT_META_FILENAME = 'meta.json'
+
+# metrics evaluated by default by max_linearized_stresses and max_linearized_strains
+MAX_LINEARIZED_METRICS = ('membrane', 'bending')
+
+
+def _stepwise(method):
+    """
+    Lets a result method be evaluated at other result sets of a result with a recorded history,
+    through the keyword argument step:
+        - None: the stored result set.
+        - int: the result set with the given index.
+        - slice or iterable of int: a list with one value per result set.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, step=None, **kwargs):
+        if step is None:
+            return method(self, *args, **kwargs)
+
+        if isinstance(step, (int, np.integer)):
+            return method(self.step(step), *args, **kwargs)
+
+        steps = range(self.n_steps)[step] if isinstance(step, slice) else step
+        return [method(self.step(i), *args, **kwargs) for i in steps]
+
+    return wrapper
+
+
 class APDLResult:
     """
     Wrapper class for an MAPDL result. Stores stress and strain data at all nodes.
     Provides access to linearization.
 
     Will be pickled or loaded to/from storage by solvers.
+
+    If a history is recorded, every result set of the MAPDL result is written to disk, and can be accessed
+    with step(i), or with the step argument of the linearization and maximum value methods.
     """
-    def __init__(self, result, i=None):
+    _COLUMNS = {
+        'stress': STRESS_COLUMNS,
+        'elastic_strain': STRAIN_COLUMNS,
+        'plastic_strain': STRAIN_COLUMNS,
+        'displacement': DISPLACEMENT_COLUMNS
+    }
+
+    def __init__(self, result, i=None, history_path=None):
         """
-        Parses nodal stress/strain data from the MAPDL result and maps it to a dictionary.
+        Reads nodal stress/strain data from the MAPDL result.
 
         Parameters
         ----------
@@ -42,116 +90,255 @@ class APDLResult:
             The timestep of the result that will be stored.
             If None, will default to final timestep.
 
+        history_path: str, optional
+            If provided, all result sets are written to this directory, one .npy array of shape
+            (n_steps x n x k) per field, and can be read lazily with step(i).
+
         Notes
         -----
         Used internally by solvers.
+        Each field is kept as the node id vector and the contiguous (n x k) array returned by the reader.
+        Dataframes are only built on access, as views of these arrays.
         """
-        if not i:
+        if i is None:
             i = result.n_results - 1
 
-        self.stress = {}
-        self.elastic_strain = {}
-        self.plastic_strain = {}
-        self.displacement = {}
+        self._frames = {}
+        self._history = None
+        self._history_path = None
+        self.time_values = np.asarray(result.time_values, dtype=float)
+        self.step_index = i % result.n_results
 
-        stress_raw = result.nodal_stress(i)
-        elastic_strain_raw = result.nodal_elastic_strain(i)
-
-        try:
-            plastic_strain_raw = result.nodal_plastic_strain(i)
-        except ValueError:
+        if history_path is not None:
+            # The fields of the stored result set are taken from the history, so no result set is read twice.
+            self._fields = _write_history(result, history_path, self.step_index)
+            self._history_path = os.path.abspath(history_path)
+        else:
+            self._fields = {field: _read_field(result, field, self.step_index) for field in self._COLUMNS}
+        if self._fields['plastic_strain'] is None:
             print("No plastic strain data available!")
-            plastic_strain_raw = None
-
-        for data in zip(stress_raw[0], stress_raw[1]):
-            self.stress[data[0]] = {
-                "X": data[1][0],
-                "Y": data[1][1],
-                "Z": data[1][2],
-                "XY": data[1][3],
-                "YZ": data[1][4],
-                "XZ": data[1][5]
-            }
-        for data in zip(elastic_strain_raw[0], elastic_strain_raw[1]):
-            self.elastic_strain[data[0]] = {
-                "X": data[1][0],
-                "Y": data[1][1],
-                "Z": data[1][2],
-                "XY": data[1][3],
-                "YZ": data[1][4],
-                "XZ": data[1][5],
-                "EQV": data[1][6]
-            }
-
-        if plastic_strain_raw is not None:
-            for data in zip(plastic_strain_raw[0], plastic_strain_raw[1]):
-                self.plastic_strain[data[0]] = {
-                    "X": data[1][0],
-                    "Y": data[1][1],
-                    "Z": data[1][2],
-                    "XY": data[1][3],
-                    "YZ": data[1][4],
-                    "XZ": data[1][5],
-                    "EQV": data[1][6]
-                }
-
-
-        # self.stress = None
-        # self.elastic_strain = None
-        # self.plastic_strain = None
-
-        # stress_raw = result.nodal_stress(i)
-        # elastic_strain_raw = result.nodal_elastic_strain(i)
-
-        # try:
-        #     plastic_strain_raw = result.nodal_plastic_strain(i)
-        # except ValueError:
-        #     print("No plastic strain data available!")
 
-        
-        # stress_rows = []
-        # for data in zip(stress_raw[0], stress_raw[1]):
-        #     stress_rows.append(pd.Series([data[0], data[1][0], data[1][1], data[1][2], data[1][3], data[1][4], data[1][5]]))
-        #     self.stress = pd.DataFrame(stress_rows)
-        #     self.stress.columns = ["Node", "X", "Y", "Z", "XY", "YZ", "XZ"]
-        #     self.stress.set_index("Node", inplace=True)
-
-        # elastic_strain_rows = []      
-        # for data in zip(elastic_strain_raw[0], elastic_strain_raw[1]):
-        #     elastic_strain_rows.append(pd.Series([data[0], data[1][0], data[1][1], data[1][2], data[1][3], data[1][4], data[1][5], data[1][6]]))
-        #     self.elastic_strain = pd.DataFrame(stress_rows)
-        #     self.elastic_strain.columns = ["Node", "X", "Y", "Z", "XY", "YZ", "XZ", "EQV"]
-        #     self.elastic_strain.set_index("Node", inplace=True)
-
-        # if plastic_strain_raw is not None:
-        #     plastic_strain_rows = []
-        #     for data in zip(plastic_strain_raw[0], plastic_strain_raw[1]):
-        #         plastic_strain_rows.append(pd.Series([data[0], data[1][0], data[1][1], data[1][2], data[1][3], data[1][4], data[1][5], data[1][6]]))
-        #         self.plastic_strain = pd.DataFrame(stress_rows)
-        #         self.plastic_strain.columns = ["Node", "X", "Y", "Z", "XY", "YZ", "XZ", "EQV"]
-        #         self.plastic_strain.set_index("Node", inplace=True)
-
-        t0 = time.time()
-        print("Making dfs")
-
-        self.stress = pd.DataFrame.from_dict(self.stress, orient='index')
-        self.elastic_strain = pd.DataFrame.from_dict(self.elastic_strain, orient='index')
-
-        if self.plastic_strain is not None:
-            self.plastic_strain = pd.DataFrame.from_dict(self.plastic_strain, orient='index')
-
-        print(f"Making dfs: {time.time() - t0}")
+    @classmethod
+    def _from_fields(cls, fields, time_values, step_index, history_path=None):
+        instance = cls.__new__(cls)
+        instance.__setstate__({
+            'fields': fields,
+            'time_values': time_values,
+            'step_index': step_index,
+            'history_path': history_path
+        })
+        return instance
+
+    def save(self, path, dtype=None):
+        """
+        Writes the result to a directory in the columnar result format:
+            - meta.json: format version, stored fields, dtype and time values.
+            - <field>_nodes.npy: the node ids of each field.
+            - <field>.npy: the (n x k) values of each field.
+
+        Parameters
+        ----------
+        path: str
+            The directory to write to.
+
+        dtype: np.dtype, optional
+            The dtype in which field values are stored, e.g. np.float32 to halve the size of the result.
+            Defaults to the dtype of the values.
+        """
+        os.makedirs(path, exist_ok=True)
+
+        fields = []
+        for field in self._COLUMNS:
+            arrays = self._field(field)
+            if arrays is None:
+                continue
+
+            nodes, values = arrays
+            np.save(os.path.join(path, f"{field}_nodes.npy"), nodes)
+            np.save(os.path.join(path, f"{field}.npy"), values if dtype is None else values.astype(dtype, copy=False))
+            fields.append(field)
+
+        meta = {
+            'format': RESULT_FORMAT,
+            'version': RESULT_FORMAT_VERSION,
+            'fields': fields,
+            'dtype': None if dtype is None else np.dtype(dtype).name,
+            'time_values': None if self.time_values is None else np.asarray(self.time_values).tolist(),
+            'step_index': int(self.step_index),
+            'history_path': self._history_path
+        }
+
+        # The metadata is written last, so a directory without it is an incomplete result.
+        with open(os.path.join(path, RESULT_META_FILENAME), 'w') as f:
+            json.dump(meta, f, indent=1)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Reads a result written by save.
+
+        Parameters
+        ----------
+        path: str
+            The directory of the result.
+
+        mmap_mode: str, optional
+            Memory-map mode of the field arrays, see np.load. With the default 'r', no field values are read
+            until they are accessed. If None, the arrays are read into memory.
+
+        Returns
+        -------
+        `:class:`APDLResult
+        """
+        with open(os.path.join(path, RESULT_META_FILENAME), 'r') as f:
+            meta = json.load(f)
+
+        if meta.get('format') != RESULT_FORMAT or meta.get('version', 0) > RESULT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported result format at {path}: {meta.get('format')} v{meta.get('version')}")
+
+        fields = {}
+        for field in meta['fields']:
+            fields[field] = (
+                np.load(os.path.join(path, f"{field}_nodes.npy")),
+                np.load(os.path.join(path, f"{field}.npy"), mmap_mode=mmap_mode)
+            )
+
+        time_values = None if meta['time_values'] is None else np.asarray(meta['time_values'])
+        return cls._from_fields(fields, time_values, meta['step_index'], meta['history_path'])
+
+    @property
+    def n_steps(self):
+        """
+        Returns
+        -------
+        int
+            The number of result sets in the MAPDL result.
+        """
+        return 1 if self.time_values is None else len(self.time_values)
+
+    @property
+    def time(self):
+        """
+        Returns
+        -------
+        float
+            The time value of the stored result set.
+        """
+        return None if self.time_values is None else self.time_values[self.step_index]
+
+    def step(self, i):
+        """
+        Parameters
+        ----------
+        i: int
+            The index of the result set. Negative indices count from the last result set.
+
+        Returns
+        -------
+        `:class:`APDLResult
+            The result at the given result set. Its fields are memory-mapped views of the recorded history,
+            which are only read from disk when accessed.
+        """
+        i = range(self.n_steps)[i]
+        if i == self.step_index:
+            return self
+
+        if self._history_path is None:
+            raise ValueError(f"No history recorded. Only result set {self.step_index} is available.")
+
+        if self._history is None:
+            self._history = _open_history(self._history_path)
+
+        fields = {field: None if arrays is None else (arrays[0], arrays[1][i])
+                  for field, arrays in self._history.items()}
+        return APDLResult._from_fields(fields, self.time_values, i, self._history_path)
+
+    @property
+    def displacement(self):
+        return self._dataframe('displacement')
+
+    @property
+    def stress(self):
+        return self._dataframe('stress')
+
+    @property
+    def elastic_strain(self):
+        return self._dataframe('elastic_strain')
+
+    @property
+    def plastic_strain(self):
+        return self._dataframe('plastic_strain')
 
     def stress_dataframe(self):
         return self.stress
 
     def strain_dataframe(self):
-        if self.plastic_strain is not None:
-            return self.elastic_strain.add(self.plastic_strain)
-        else:
+        if self._field('plastic_strain') is None:
             return self.elastic_strain
 
-    def linearized_stress_result(self, flat=False):
+        elastic_nodes, elastic = self._field('elastic_strain')
+        plastic_nodes, plastic = self._field('plastic_strain')
+
+        if np.array_equal(elastic_nodes, plastic_nodes):
+            return pd.DataFrame(elastic + plastic, index=elastic_nodes, columns=STRAIN_COLUMNS)
+        else:
+            return self.elastic_strain.add(self.plastic_strain)
+
+    def _dataframe(self, field):
+        if field not in self._frames:
+            arrays = self._field(field)
+            if arrays is None:
+                self._frames[field] = None
+            else:
+                nodes, values = arrays
+                self._frames[field] = pd.DataFrame(values, index=nodes, columns=self._COLUMNS[field], copy=False)
+
+        return self._frames[field]
+
+    def _field(self, field):
+        return self._fields[field]
+
+    def __getstate__(self):
+        return {
+            'fields': self._fields,
+            'time_values': self.time_values,
+            'step_index': self.step_index,
+            'history_path': self._history_path
+        }
+
+    def __setstate__(self, state):
+        self._frames = {}
+        self._history = None
+        self._history_path = state.get('history_path')
+        self.time_values = state.get('time_values')
+        self.step_index = state.get('step_index', 0)
+
+        if 'fields' in state:
+            self._fields = dict(state['fields'])
+            for field in self._COLUMNS:
+                self._fields.setdefault(field, None)
+            return
+
+        # Results pickled before the array-backed layout stored a dataframe per field.
+        self._fields = {}
+        for field in self._COLUMNS:
+            df = state.get(field)
+            if isinstance(df, pd.DataFrame) and not df.empty:
+                self._fields[field] = (df.index.to_numpy(), np.ascontiguousarray(df.to_numpy(dtype=float)))
+            else:
+                self._fields[field] = None
+
+    @_stepwise
+    def linearized_stress_result(self, flat=False, metrics=None):
+        """
+        Parameters
+        ----------
+        flat: bool, optional
+            If True, linearizes across the surfaces of the flat geometry.
+
+        metrics: Iterable[str], optional
+            The metrics to compute. See linearization.surface.linearize_stresses. If None, computes all metrics.
+        """
         dataframe = self.stress_dataframe()
         
         top_path = _FLAT_TOP_SURFACE_PATH if flat else _TOP_SURFACE_PATH
@@ -164,10 +351,21 @@ class APDLResult:
             dataframe,
             all_path,
             None,
-            False
+            False,
+            metrics=metrics
         )
 
-    def linearized_strain_result(self, flat=False):
+    @_stepwise
+    def linearized_strain_result(self, flat=False, metrics=None):
+        """
+        Parameters
+        ----------
+        flat: bool, optional
+            If True, linearizes across the surfaces of the flat geometry.
+
+        metrics: Iterable[str], optional
+            The metrics to compute. See linearization.surface.linearize_stresses. If None, computes all metrics.
+        """
         dataframe = self.strain_dataframe()
         dataframe = dataframe.drop(dataframe.columns[6], axis=1)
 
@@ -181,25 +379,79 @@ class APDLResult:
             dataframe,
             all_path,
             None,
-            True
+            True,
+            metrics=metrics
         )
 
-    def max_linearized_stresses(self, flat=False):
-        lin_result = self.linearized_stress_result(flat=flat)
-        return {
-            'membrane': lin_result['membrane'].max(),
-            'bending': lin_result['bending'].max(),
-            'linearized': (lin_result['membrane'] + lin_result['bending']).max()
-        }
+    @_stepwise
+    def max_linearized_stresses(self, flat=False, metrics=MAX_LINEARIZED_METRICS):
+        """
+        Returns
+        -------
+        dict
+            The maximum of each of the given linearization metrics, and of membrane + bending
+            if both are given.
+        """
+        return _max_linearized(self.linearized_stress_result(flat=flat, metrics=metrics))
 
-    def max_linearized_strains(self, flat=False):
-        lin_result = self.linearized_strain_result(flat=flat)
-        return {
-            'membrane': lin_result['membrane'].max(),
-            'bending': lin_result['bending'].max(),
-            'linearized': (lin_result['membrane'] + lin_result['bending']).max()
-        }
+    @_stepwise
+    def max_linearized_strains(self, flat=False, metrics=MAX_LINEARIZED_METRICS):
+        """
+        Returns
+        -------
+        dict
+            The maximum of each of the given linearization metrics, and of membrane + bending
+            if both are given.
+        """
+        return _max_linearized(self.linearized_strain_result(flat=flat, metrics=metrics))
+
+    @_stepwise
+    def linearize_all(self, flat=False, metrics=MAX_LINEARIZED_METRICS, summary=True):
+        """
+        Linearizes stresses and strains together, with a single interpolation of both fields
+        and one batched integration.
+
+        Parameters
+        ----------
+        flat: bool, optional
+            If True, linearizes across the surfaces of the flat geometry.
+
+        metrics: Iterable[str], optional
+            The metrics to compute. See linearization.surface.linearize_stresses. If None, computes all metrics.
+
+        summary: bool, optional
+            If True, returns the maxima as returned by max_linearized_stresses and max_linearized_strains.
+            Otherwise, returns the linearization results as returned by linearized_stress_result
+            and linearized_strain_result.
+
+        Returns
+        -------
+        dict
+            The results of the stresses and strains, under the keys 'stress' and 'strain'.
+        """
+        stress = self.stress_dataframe()
+        strain = self.strain_dataframe()
+        strain = strain.drop(strain.columns[6], axis=1)
+
+        top_path = _FLAT_TOP_SURFACE_PATH if flat else _TOP_SURFACE_PATH
+        bot_path = _FLAT_BOTTOM_SURFACE_PATH if flat else _BOTTOM_SURFACE_PATH
+        all_path = _FLAT_ALL_LOCS_PATH if flat else _ALL_LOCS_PATH
+
+        stress_result, strain_result = surface.linearize_fields(
+            top_path,
+            bot_path,
+            [stress, strain],
+            all_path,
+            [False, True],
+            metrics=metrics
+        )
+
+        if summary:
+            return {'stress': _max_linearized(stress_result), 'strain': _max_linearized(strain_result)}
+
+        return {'stress': stress_result, 'strain': strain_result}
 
+    @_stepwise
     def max_eqv_stress(self, nodes=None):
         stress_df = self.stress_dataframe()
 
@@ -209,6 +461,7 @@ class APDLResult:
         eqv_stress = linearization.von_mises(stress_df.values)
         return max(eqv_stress)
 
+    @_stepwise
     def max_eqv_strain(self, nodes=None):
         strain_df = self.strain_dataframe()
         strain_df = strain_df.drop(strain_df.columns[6], axis=1)
@@ -218,3 +471,202 @@ class APDLResult:
 
         eqv_stress = linearization.von_mises_strain(strain_df.values)
         return max(eqv_stress)
+
+
+class RSTResult(APDLResult):
+    """
+    APDLResult backed by an MAPDL result file (*.rst).
+
+    Only the path of the result file and its time values are stored. Each field is read from the result file on
+    first access, so fields that are never accessed are never read. All result sets can be accessed with step(i).
+
+    Requires ansys-mapdl-reader.
+    """
+    def __init__(self, rst_path, i=None):
+        """
+        Parameters
+        ----------
+        rst_path: str
+            The path of the MAPDL result file. The file needs to remain at this path for the lifetime of the result.
+
+        i: int, optional
+            The timestep of the result that will be accessed.
+            If None, will default to final timestep.
+        """
+        from ansys.mapdl.reader import read_binary
+        rst_path = os.path.abspath(rst_path)
+        result = read_binary(rst_path)
+        if i is None:
+            i = result.n_results - 1
+
+        self.__setstate__({
+            'rst_path': rst_path,
+            'time_values': np.asarray(result.time_values, dtype=float),
+            'step_index': i % result.n_results
+        })
+        self._reader = result
+
+    @property
+    def rst_path(self):
+        return self._rst_path
+
+    def step(self, i):
+        i = range(self.n_steps)[i]
+        if i == self.step_index:
+            return self
+
+        instance = RSTResult.__new__(RSTResult)
+        instance.__setstate__(self.__getstate__())
+        instance.step_index = i
+        instance._reader = self._reader
+        return instance
+
+    def _field(self, field):
+        if field not in self._fields:
+            print(f"Reading {field} of result set {self.step_index} from {self._rst_path} ...")
+            self._fields[field] = _read_field(self._result(), field, self.step_index)
+
+        return self._fields[field]
+
+    def _result(self):
+        if self._reader is None:
+            from ansys.mapdl.reader import read_binary
+            self._reader = read_binary(self._rst_path)
+
+        return self._reader
+
+    def __getstate__(self):
+        return {
+            'rst_path': self._rst_path,
+            'time_values': self.time_values,
+            'step_index': self.step_index
+        }
+
+    def __setstate__(self, state):
+        self._rst_path = state['rst_path']
+        self._reader = None
+        self._fields = {}
+        self._frames = {}
+        self._history = None
+        self._history_path = None
+        self.time_values = state['time_values']
+        self.step_index = state['step_index']
+
+
+def linearization_key(flat=False):
+    """
+    Returns
+    -------
+    str
+        The key of the linearization plan used by linearize_all, derived from the node files, the SCL points,
+        the pairing and the plan version. Values computed by linearize_all are only comparable for equal keys.
+    """
+    if flat:
+        return plan_key(_FLAT_TOP_SURFACE_PATH, _FLAT_BOTTOM_SURFACE_PATH, _FLAT_ALL_LOCS_PATH)
+
+    return plan_key(_TOP_SURFACE_PATH, _BOTTOM_SURFACE_PATH, _ALL_LOCS_PATH)
+
+
+def _max_linearized(lin_result):
+    maxima = {metric: values.max() for metric, values in lin_result.items() if metric != 'location'}
+    if 'membrane' in lin_result and 'bending' in lin_result:
+        maxima['linearized'] = (lin_result['membrane'] + lin_result['bending']).max()
+
+    return maxima
+
+
+_READERS = {
+    'stress': 'nodal_stress',
+    'elastic_strain': 'nodal_elastic_strain',
+    'plastic_strain': 'nodal_plastic_strain',
+    'displacement': 'nodal_displacement'
+}
+
+
+def _read_field(result, field, i):
+    try:
+        nodes, values = getattr(result, _READERS[field])(i)
+    except ValueError:
+        return None
+
+    values = np.ascontiguousarray(values[:, :len(APDLResult._COLUMNS[field])], dtype=float)
+    return np.asarray(nodes), values
+
+
+def _write_history(result, path, step_index):
+    """
+    Writes all result sets to the history directory, and returns the fields of the given result set.
+    The history is written to a temporary directory that replaces the history directory once complete,
+    so results referencing an existing history never see a partially written one.
+    """
+    print(f"Writing result history to {path} ...")
+    temp_path = f"{os.path.abspath(path)}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(temp_path)
+
+    try:
+        fields = _write_history_sets(result, temp_path, step_index)
+        _replace_directory(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            shutil.rmtree(temp_path)
+
+    return fields
+
+
+def _write_history_sets(result, path, step_index):
+    n_steps = result.n_results
+    np.save(os.path.join(path, 'time_values.npy'), np.asarray(result.time_values, dtype=float))
+
+    # Written one result set at a time, so only a single result set is held in memory.
+    memmaps = {}
+    fields = dict.fromkeys(APDLResult._COLUMNS)
+    for i in range(n_steps):
+        for field in APDLResult._COLUMNS:
+            arrays = _read_field(result, field, i)
+            if arrays is None:
+                continue
+
+            if i == step_index:
+                fields[field] = arrays
+
+            nodes, values = arrays
+            if field not in memmaps:
+                np.save(os.path.join(path, f"{field}_nodes.npy"), nodes)
+                memmaps[field] = np.lib.format.open_memmap(
+                    os.path.join(path, f"{field}.npy"), mode='w+', dtype=float, shape=(n_steps, *values.shape))
+
+            memmaps[field][i] = values
+
+    # The memory maps are closed before the directory is moved into place.
+    for memmap in memmaps.values():
+        memmap.flush()
+    memmaps.clear()
+
+    return fields
+
+
+def _open_history(path):
+    history = {}
+    for field in APDLResult._COLUMNS:
+        values_path = os.path.join(path, f"{field}.npy")
+        if os.path.exists(values_path):
+            history[field] = (np.load(os.path.join(path, f"{field}_nodes.npy")), np.load(values_path, mmap_mode='r'))
+        else:
+            history[field] = None
+
+    return history
+
+
+def _replace_directory(source, target):
+    # Directories cannot be replaced atomically if the target exists, so the existing target
+    # is moved aside first and only deleted once the new directory is in place.
+    # Files still memory-mapped by an older result cannot be deleted on every platform, and are left behind.
+    old_path = None
+    if os.path.exists(target):
+        old_path = f"{target}.{uuid.uuid4().hex}.old"
+        os.replace(target, old_path)
+
+    os.replace(source, target)
+
+    if old_path is not None:
+        shutil.rmtree(old_path, ignore_errors=True)
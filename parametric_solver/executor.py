@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import uuid
+import threading
+import pandas as pd
+
+
+class SolveExecutor:
+    """
+    Runs sample solves with a bounded number of attempts per sample.
+
+    Attempts that fail with a transient error, e.g. a crashed or unreachable MAPDL instance, are retried with
+    exponential backoff. A sample that fails on every attempt, or with any other error, is quarantined
+    and skipped, so a single sample cannot stall a whole run. The status, attempts, failures and timings of every
+    sample are persisted in a checkpoint file, from which a restarted run resumes.
+    """
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    QUARANTINED = 'quarantined'
+
+    def __init__(self, checkpoint_path=None, max_attempts=3, backoff=10.0, max_backoff=300.0,
+                 transient_errors=(ConnectionError, TimeoutError)):
+        """
+        Parameters
+        ----------
+        checkpoint_path: str, optional
+            The JSON file in which progress is persisted. If None, progress is only kept in memory.
+
+        max_attempts: int, optional
+            The number of attempts after which a failing sample is quarantined.
+
+        backoff: float, optional
+            The delay in seconds after the first failed attempt. Doubles with every further failed attempt.
+
+        max_backoff: float, optional
+            The maximum delay in seconds between attempts.
+
+        transient_errors: tuple of type, optional
+            The exception types after which an attempt is retried. Samples failing with any other exception
+            are deterministic failures, e.g. an invalid input, and are quarantined without further attempts.
+        """
+        self._checkpoint_path = checkpoint_path
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._transient_errors = tuple(transient_errors)
+        self._lock = threading.RLock()
+        self._progress = self._read_checkpoint()
+
+    def is_quarantined(self, key):
+        with self._lock:
+            return self._progress.get(key, {}).get('status') == self.QUARANTINED
+
+    def release(self, key):
+        """
+        Removes a sample from quarantine, giving it a new budget of attempts.
+        """
+        with self._lock:
+            if self.is_quarantined(key):
+                self._progress[key]['status'] = self.FAILED
+                self._progress[key]['attempts'] = 0
+                self._write_checkpoint()
+
+    def run(self, key, solve, on_failure=None):
+        """
+        Solves a sample, retrying failed attempts until the sample is solved or quarantined.
+
+        Parameters
+        ----------
+        key: str
+            Unique identifier of the sample.
+
+        solve: callable
+            Function without arguments that solves the sample and returns the result.
+
+        on_failure: callable, optional
+            Function called with the raised exception after each failed attempt, e.g. to relaunch MAPDL.
+
+        Returns
+        -------
+        Any
+            The result returned by solve. If the sample is or becomes quarantined, returns None.
+        """
+        if self.is_quarantined(key):
+            print(f"Sample {key} is quarantined. Skipping ...")
+            return None
+
+        while True:
+            start_time = time.time()
+            try:
+                result = solve()
+            except Exception as e:
+                elapsed = time.time() - start_time
+                attempts = self._record_failure(key, e, elapsed)
+                print(f"Attempt {attempts}/{self._max_attempts} failed for sample {key}: {type(e).__name__}: {e}")
+
+                if on_failure is not None:
+                    on_failure(e)
+
+                if not isinstance(e, self._transient_errors) or attempts >= self._max_attempts:
+                    print(f"Quarantining sample {key} ...")
+                    with self._lock:
+                        self._progress[key]['status'] = self.QUARANTINED
+                        self._write_checkpoint()
+                    return None
+
+                delay = min(self._backoff * 2 ** (attempts - 1), self._max_backoff)
+                print(f"Retrying in {delay:.0f} seconds ...")
+                time.sleep(delay)
+                continue
+
+            self._record_success(key, time.time() - start_time)
+            return result
+
+    def statistics(self):
+        """
+        Returns
+        -------
+        pd.DataFrame
+            The status, number of attempts and failures, last error, time of the successful attempt and
+            total time spent on every sample, indexed by sample key.
+        """
+        with self._lock:
+            df = pd.DataFrame.from_dict(self._progress, orient='index')
+
+        return df.reindex(columns=['status', 'attempts', 'failures', 'last_error', 'solve_time', 'total_time'])
+
+    def _entry(self, key):
+        return self._progress.setdefault(key, {
+            'status': None,
+            'attempts': 0,
+            'failures': 0,
+            'last_error': None,
+            'solve_time': None,
+            'total_time': 0.0
+        })
+
+    def _record_failure(self, key, error, elapsed):
+        with self._lock:
+            entry = self._entry(key)
+            entry['status'] = self.FAILED
+            entry['attempts'] += 1
+            entry['failures'] += 1
+            entry['last_error'] = f"{type(error).__name__}: {error}"
+            entry['total_time'] += elapsed
+            self._write_checkpoint()
+            return entry['attempts']
+
+    def _record_success(self, key, elapsed):
+        with self._lock:
+            entry = self._entry(key)
+            entry['status'] = self.COMPLETED
+            entry['attempts'] += 1
+            entry['solve_time'] = elapsed
+            entry['total_time'] += elapsed
+            self._write_checkpoint()
+
+    def _read_checkpoint(self):
+        if self._checkpoint_path is None or not os.path.exists(self._checkpoint_path):
+            return {}
+
+        with open(self._checkpoint_path, 'r') as f:
+            progress = json.load(f)
+
+        print(f"Resuming from checkpoint {self._checkpoint_path} ...")
+        return progress
+
+    def _write_checkpoint(self):
+        if self._checkpoint_path is None:
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(self._checkpoint_path)), exist_ok=True)
+        temp_path = f"{self._checkpoint_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self._progress, f, indent=1)
+        os.replace(temp_path, self._checkpoint_path)
@@ -0,0 +1,116 @@
+import os
+import json
+import uuid
+import atexit
+import hashlib
+import threading
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'parametric_solver', 'fingerprints.json')
+
+
+class FingerprintCache:
+    """
+    Persistent cache of file checksums, keyed by (path, size, mtime_ns).
+
+    A file is only hashed again when its size or modification time changes.
+    New checksums are written back to disk periodically and when the process exits.
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH, flush_interval=100):
+        """
+        Parameters
+        ----------
+        path: str, optional
+            The JSON file in which checksums are persisted. If None, checksums are only cached in memory.
+
+        flush_interval: int, optional
+            The number of new checksums after which the cache is written to disk.
+        """
+        self._path = path
+        self._flush_interval = flush_interval
+        self._entries = None
+        self._dirty = 0
+        self._lock = threading.RLock()
+
+    def checksum(self, file_path):
+        """
+        Returns
+        -------
+        str
+            The SHA-256 hex digest of the file's contents.
+        """
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(file_path)
+            if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                return entry[2]
+
+        digest = _hash_file(file_path)
+
+        with self._lock:
+            self._entries[file_path] = [stat.st_size, stat.st_mtime_ns, digest]
+            self._dirty += 1
+            if self._dirty >= self._flush_interval:
+                self.flush()
+
+        return digest
+
+    def flush(self):
+        """
+        Writes new checksums to disk, merged with checksums written by other processes.
+        """
+        with self._lock:
+            if not self._dirty or self._path is None:
+                return
+
+            entries = self._read()
+            entries.update(self._entries)
+
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            temp_path = f"{self._path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(temp_path, 'w') as f:
+                    json.dump(entries, f)
+                os.replace(temp_path, self._path)
+            except OSError as e:
+                print(f"Failed to write fingerprint cache {self._path}: {e}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return
+
+            self._entries = entries
+            self._dirty = 0
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = self._read()
+
+        return self._entries
+
+    def _read(self):
+        if self._path is None or not os.path.exists(self._path):
+            return {}
+
+        try:
+            with open(self._path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            print(f"Ignoring unreadable fingerprint cache {self._path}.")
+            return {}
+
+
+def _hash_file(file_path):
+    sha256_hash = hashlib.sha256()
+
+    with open(file_path, "rb") as f:
+        for byte_block in iter(lambda: f.read(1 << 20), b""):
+            sha256_hash.update(byte_block)
+
+    return sha256_hash.hexdigest()
+
+
+fingerprints = FingerprintCache(os.environ.get('PARAMETRIC_SOLVER_FINGERPRINTS', DEFAULT_CACHE_PATH))
+atexit.register(fingerprints.flush)
@@ -1,13 +1,15 @@
 import os
 import sys
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from scipy.interpolate import NearestNDInterpolator, LinearNDInterpolator
 
 CURR_DIR = os.path.dirname(os.path.abspath(__file__))
 PARENT_DIR = os.path.dirname(CURR_DIR)
 sys.path.append(PARENT_DIR)
 
-from parametric_solver.solver import NodeContext
+from parametric_solver.solver import NodeContext, MAPPED_PRESSURE_EXT
+from linearization.vinterp import surface_interpolation_matrix
 
 ELEMENT_ROOT = os.path.join(PARENT_DIR, 'inp', 'processing')
 NODE_DIR = os.path.join(PARENT_DIR, 'inp', 'nodes')
@@ -52,3 +54,83 @@ def write_temperature_load(load_path, component, flat):
 
     with open(os.path.join(load_dir, real_name + '.cdb'), 'w') as f:
         f.write(load_str)
+
+
+def write_pressure_load(load_path, component, flat):
+    """
+    Linearly interpolates the pressure of a processed pressure file on the surface onto the nodes of a component,
+    and writes the nodal surface loads next to the pressure file as <name>.sf.
+    See linearization.vinterp.surface_interpolation_matrix.
+
+    The written file can be added to a sample as a pressure load in place of the pressure file,
+    in which case it is read directly instead of being mapped by MAPDL.
+
+    Parameters
+    ----------
+    load_path: str
+        Path to the pressure file, processed by process_pressure.
+
+    component: str
+        Name of the component to which the load is applied. The node locations of the component are read
+        from <component>.loc (or flat_<component>.loc) in the nodes directory, as written by NodeContext.
+        Components without a node locations file are skipped.
+
+    Returns
+    -------
+    bool
+        Whether the load was written.
+    """
+    target_nodes = os.path.join(NODE_DIR, f"flat_{component}.loc" if flat else f"{component}.loc")
+    if not os.path.exists(target_nodes):
+        print(f"No node locations at {target_nodes}. Skipping pressure mapping of {load_path} ...")
+        return False
+
+    raw_data = pd.read_csv(load_path, index_col=0)
+    raw_data.columns = raw_data.columns.str.strip()
+    raw_locs = raw_data.iloc[:, 0:3].to_numpy()
+    raw_pressures = raw_data['total-pressure'].to_numpy()
+
+    target_data = _read_node_locations(target_nodes)
+
+    pressures = surface_interpolation_matrix(raw_locs, target_data.to_numpy()) @ raw_pressures
+    load_str = ''.join(f"sf,{node},pres,{pressure:.9e}\n" for node, pressure in zip(target_data.index, pressures))
+
+    load_dir = os.path.dirname(load_path)
+    filename = os.path.basename(load_path)
+    real_name = os.path.splitext(filename)[0]
+
+    with open(os.path.join(load_dir, real_name + MAPPED_PRESSURE_EXT), 'w') as f:
+        f.write(load_str)
+
+    return True
+
+
+def write_pressure_loads(loads, flat, processes=None):
+    """
+    Writes the nodal surface loads of multiple pressure files in parallel. See write_pressure_load.
+
+    Parameters
+    ----------
+    loads: list of tuple
+        The (load_path, component) pairs to write.
+
+    processes: int, optional
+        The number of worker processes. Defaults to the number of processors.
+
+    Returns
+    -------
+    int
+        The number of written loads.
+    """
+    load_paths, components = zip(*loads)
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return sum(executor.map(write_pressure_load, load_paths, components, [flat] * len(loads)))
+
+
+def _read_node_locations(path):
+    df = pd.read_csv(path, index_col=0, header=None)
+    df.index = pd.to_numeric(df.index, errors='coerce')
+    df = df[df.index.notna()].astype(float)
+    df.index = df.index.astype(int)
+    return df.iloc[:, 0:3]
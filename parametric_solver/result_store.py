@@ -0,0 +1,348 @@
+import os
+import sys
+import shutil
+import sqlite3
+import pickle
+import json
+import time
+import uuid
+import argparse
+import numpy as np
+import pandas as pd
+
+CURR_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(CURR_DIR)
+sys.path.append(PARENT_DIR)
+
+from parametric_solver.apdl_result import APDLResult, RSTResult, RESULT_META_FILENAME, _replace_directory
+
+
+COLUMNAR_EXT = '.res'
+
+
+class ResultStore:
+    """
+    Directory of solver results, indexed by a SQLite manifest.
+
+    Every result is keyed by the fingerprint of the sample it was solved for. The manifest maps each
+    fingerprint to its result file, so lookups and cache checks never scan the directory or open result files.
+    Scalar summaries (e.g. maximum linearized stresses) can be stored alongside each entry, and queried for
+    all results at once without loading them.
+
+    Results stored with the .res extension are written in the columnar format of APDLResult.save, and loaded
+    memory-mapped. Results with any other extension are pickled.
+    """
+    MANIFEST = 'manifest.sqlite'
+
+    def __init__(self, path, dtype=None):
+        """
+        Parameters
+        ----------
+        path: str
+            The directory in which results and the manifest are stored.
+            Created on first write if it does not exist.
+
+        dtype: np.dtype, optional
+            The dtype in which columnar results are stored, e.g. np.float32. Defaults to the dtype of the result.
+        """
+        self._path = os.path.abspath(path)
+        self._dtype = dtype
+        self._manifest = os.path.join(self._path, self.MANIFEST)
+        self._initialized = False
+
+    @property
+    def path(self):
+        return self._path
+
+    def __contains__(self, key):
+        return bool(self._query("SELECT 1 FROM results WHERE key = ?", (key,)))
+
+    def __len__(self):
+        return self._query("SELECT COUNT(*) FROM results")[0][0]
+
+    def keys(self):
+        return [row[0] for row in self._query("SELECT key FROM results")]
+
+    def filepath(self, key):
+        """
+        Returns
+        -------
+        str
+            The path of the result file stored under the given key. If no such result exists, returns None.
+        """
+        rows = self._query("SELECT filename FROM results WHERE key = ?", (key,))
+        if not rows:
+            return None
+
+        return os.path.join(self._path, rows[0][0])
+
+    def put(self, key, result, filename=None, name=None, summary=None):
+        """
+        Writes a result to the store.
+
+        Parameters
+        ----------
+        key: str
+            The fingerprint of the sample the result was solved for.
+
+        result: Any
+            The result to store.
+
+        filename: str, optional
+            The filename of the result, relative to the store directory. Defaults to the key with a .pkl extension.
+            If the filename has the .res extension, the result is written in the columnar format.
+
+        name: str, optional
+            Human-readable name of the sample.
+
+        summary: dict, optional
+            Scalar values describing the result, stored in the manifest.
+
+        Notes
+        -----
+        The result is written to a temporary file and moved into place before it is added to the manifest,
+        so an interrupted write never leaves a truncated result behind.
+        """
+        if filename is None:
+            filename = f"{key}.pkl"
+
+        filepath = os.path.join(self._path, filename)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+        temp_path = f"{filepath}.{uuid.uuid4().hex}.tmp"
+        try:
+            if filename.endswith(COLUMNAR_EXT):
+                result.save(temp_path, dtype=self._dtype)
+                _replace_directory(temp_path, filepath)
+            else:
+                with open(temp_path, "wb") as f:
+                    pickle.dump(result, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, filepath)
+        finally:
+            _remove_path(temp_path)
+
+        self.register(key, filename, name=name, summary=summary)
+
+    def register(self, key, filename, name=None, summary=None):
+        """
+        Adds an existing result file in the store directory to the manifest.
+        """
+        filepath = os.path.join(self._path, filename)
+        self._query(
+            "INSERT OR REPLACE INTO results (key, name, filename, size, created, summary) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, name, filename, _path_size(filepath), time.time(), json.dumps(summary or {}))
+        )
+
+    def get(self, key):
+        """
+        Returns
+        -------
+        Any
+            The result stored under the given key. If no such result exists, returns None.
+        """
+        filepath = self.filepath(key)
+        if filepath is None:
+            return None
+
+        if not os.path.exists(filepath):
+            print(f"Result file {filepath} is missing. Removing it from the manifest ...")
+            self.remove(key)
+            return None
+
+        print(f"Loading cached result from {filepath} ...")
+        return load_result(filepath)
+
+    def remove(self, key):
+        self._query("DELETE FROM results WHERE key = ?", (key,))
+
+    def summary(self, key):
+        """
+        Returns
+        -------
+        dict
+            The summary stored for the given key. If no such result exists, returns None.
+        """
+        rows = self._query("SELECT summary FROM results WHERE key = ?", (key,))
+        if not rows:
+            return None
+
+        return json.loads(rows[0][0])
+
+    def update_summary(self, key, **values):
+        """
+        Adds the given values to the summary of the result stored under the given key.
+        """
+        summary = self.summary(key)
+        if summary is None:
+            raise KeyError(key)
+
+        summary.update(values)
+        self._query("UPDATE results SET summary = ? WHERE key = ?", (json.dumps(summary), key))
+
+    def entries(self):
+        """
+        Returns
+        -------
+        pd.DataFrame
+            The manifest, indexed by key, with one column per summary value.
+        """
+        rows = self._query("SELECT key, name, filename, size, created, summary FROM results")
+        df = pd.DataFrame(
+            [row[:5] for row in rows],
+            columns=['key', 'name', 'filename', 'size', 'created']
+        ).set_index('key')
+        summaries = pd.DataFrame([json.loads(row[5]) for row in rows], index=df.index)
+        return pd.concat([df, summaries], axis=1)
+
+    def migrate(self, remove=False):
+        """
+        Converts all pickled results in the manifest to the columnar format.
+        Results backed by a result file (RSTResult) are kept as they are, since they read their fields lazily.
+
+        Parameters
+        ----------
+        remove: bool, optional
+            If True, the pickles are deleted once converted.
+
+        Returns
+        -------
+        int
+            The number of converted results.
+        """
+        rows = self._query("SELECT key, name, filename, summary FROM results")
+        count = 0
+
+        for key, name, filename, summary in rows:
+            if filename.endswith(COLUMNAR_EXT):
+                continue
+
+            result = self.get(key)
+            if not isinstance(result, APDLResult) or isinstance(result, RSTResult):
+                continue
+
+            columnar_filename = os.path.splitext(filename)[0] + COLUMNAR_EXT
+            print(f"Converting {filename} to {columnar_filename} ...")
+            self.put(key, result, filename=columnar_filename, name=name, summary=json.loads(summary))
+            count += 1
+
+            if remove:
+                os.remove(os.path.join(self._path, filename))
+
+        return count
+
+    def index_files(self, extensions=('.pkl', COLUMNAR_EXT)):
+        """
+        Adds result files in the store directory that are missing from the manifest,
+        using their filename without extension as key. Columnar results are only added once complete.
+
+        Returns
+        -------
+        int
+            The number of added files.
+        """
+        if not os.path.isdir(self._path):
+            return 0
+
+        known = set(row[0] for row in self._query("SELECT filename FROM results"))
+        count = 0
+        for filename in os.listdir(self._path):
+            if filename.endswith(tuple(extensions)) and filename not in known \
+                    and is_complete_result(os.path.join(self._path, filename)):
+                self.register(os.path.splitext(filename)[0], filename)
+                count += 1
+
+        return count
+
+    def _query(self, sql, params=()):
+        if not self._initialized:
+            self._initialize()
+
+        conn = sqlite3.connect(self._manifest, timeout=60)
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def _initialize(self):
+        os.makedirs(self._path, exist_ok=True)
+
+        conn = sqlite3.connect(self._manifest, timeout=60)
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    "key TEXT PRIMARY KEY, name TEXT, filename TEXT NOT NULL, "
+                    "size INTEGER, created REAL, summary TEXT)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS results_name ON results (name)")
+        finally:
+            conn.close()
+
+        self._initialized = True
+
+
+def is_complete_result(filepath):
+    """
+    Returns whether a result file exists at the given path. Columnar results are only complete once their
+    metadata is written, see APDLResult.save.
+    """
+    if filepath.endswith(COLUMNAR_EXT):
+        return os.path.isfile(os.path.join(filepath, RESULT_META_FILENAME))
+
+    return os.path.isfile(filepath)
+
+
+def load_result(filepath):
+    """
+    Reads a result file of a result store. Columnar results are memory-mapped, all others are unpickled.
+    """
+    if filepath.endswith(COLUMNAR_EXT):
+        return APDLResult.load(filepath, mmap_mode='r')
+
+    with open(filepath, "rb") as f:
+        return pickle.load(f)
+
+
+def prefetch_result(filepath, chunk_size=1 << 22):
+    """
+    Reads a result file once without keeping its contents, so a subsequent load is served from the page cache.
+    """
+    paths = [filepath]
+    if os.path.isdir(filepath):
+        paths = [os.path.join(filepath, filename) for filename in os.listdir(filepath)]
+
+    for path in paths:
+        with open(path, "rb") as f:
+            while f.read(chunk_size):
+                pass
+
+    return filepath
+
+
+def _remove_path(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _path_size(path):
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+
+    return sum(os.path.getsize(os.path.join(path, filename)) for filename in os.listdir(path))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Converts the pickled results of a result directory to the columnar format.')
+    parser.add_argument('path', type=str)
+    parser.add_argument('--float32', action='store_true')
+    parser.add_argument('--remove', action='store_true')
+    args = parser.parse_args()
+
+    store = ResultStore(args.path, dtype=np.float32 if args.float32 else None)
+    print(f"Indexed {store.index_files()} unindexed result files.")
+    print(f"Converted {store.migrate(remove=args.remove)} results.")
@@ -1,5 +1,4 @@
 import abc
-import pickle
 import os
 import time
 import sys
@@ -10,22 +9,36 @@ import numpy as np
 import pandas as pd
 import shutil
 import uuid
+import queue
+import threading
 from ansys.mapdl.core.errors import MapdlExitedError
 
 PARENT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(PARENT_DIR)
 
 import parametric_solver.inp as inp
-from parametric_solver.apdl_result import APDLResult
+from parametric_solver.apdl_result import APDLResult, RSTResult
+from parametric_solver.result_store import ResultStore, COLUMNAR_EXT, is_complete_result
+from parametric_solver.fingerprint import fingerprints
+from parametric_solver.executor import SolveExecutor
 from apdl_util.util import get_mapdl
 from apdl_util import util
 
+
+MAPPED_PRESSURE_EXT = '.sf'
+# errors of a crashed, hung or unreachable MAPDL instance, after which a sample is attempted again
+TRANSIENT_ERRORS = (MapdlExitedError, ConnectionError, TimeoutError)
+
+
 class ParametricSolver(abc.ABC):
     """
     Base class for parametric solving.
     Implements PyMAPDL interface.
     """
-    def __init__(self, write_path="", **kwargs):
+    CHECKPOINT_FILENAME = 'solve_progress.json'
+
+    def __init__(self, write_path="", launcher=None, snapshots=True, history=False, columnar=True, result_dtype=None,
+                 lazy_results=False, **kwargs):
         """
         Initializes the solver and processes the input file.
 
@@ -38,6 +51,30 @@ class ParametricSolver(abc.ABC):
         write_path: str, optional
             The path at which solutions will be stored, and from which previous solutions are read.
 
+        launcher: callable, optional
+            Function used to start MAPDL instances, called with the PyMAPDL keyword arguments.
+            Defaults to launch_mapdl. Can be replaced to run the solver against a fake MAPDL.
+
+        snapshots: bool, optional
+            If True, the model defined by a sample's input file is saved to a database snapshot in the
+            MAPDL working directory the first time it is read, keyed by the input file's checksum.
+            Later samples with the same input file resume the snapshot instead of re-reading the input file.
+
+        history: bool, optional
+            If True, all result sets of each solution are recorded in <write_path>/<sample>.history,
+            and can be accessed through the results' step method. Otherwise, only the final result set is stored.
+
+        columnar: bool, optional
+            If True, results are stored in the columnar format (<sample>.res directories) and loaded memory-mapped.
+            Otherwise, results are pickled. Existing results are read in either format.
+
+        result_dtype: np.dtype, optional
+            The dtype in which columnar results are stored, e.g. np.float32. Defaults to float64.
+
+        lazy_results: bool, optional
+            If True, the MAPDL result file of each solution is copied to <write_path>/<sample>.rst,
+            and results are stored as an RSTResult, which reads fields from that file only when they are accessed.
+
         **kwargs:
             Keyword arguments to be passed during PyMAPDL instance creation. See PyMAPDL documentation (launch_mapdl).
 
@@ -46,7 +83,15 @@ class ParametricSolver(abc.ABC):
             The input file will be modified to exclude solving.
         """
         self._samples = []
+        self._name_index = None
         self._write_path = write_path
+        self._store = ResultStore(write_path, dtype=result_dtype)
+        self._columnar = columnar
+        self._lazy_results = lazy_results
+        self._launcher = launcher
+        self._snapshots = snapshots
+        self._history = history
+        self._executor = None
         self._mapdl_kwargs = kwargs
 
     @property
@@ -59,8 +104,20 @@ class ParametricSolver(abc.ABC):
         list
             The list containing all added samples at which a solution is to be obtained, or has already been obtained.
         """
+        # The list can be modified in place by the caller, so the name index is rebuilt on the next lookup.
+        self._name_index = None
         return self._samples
 
+    @property
+    def store(self):
+        """
+        Returns
+        -------
+        `:class:`ResultStore
+            The result store in the write directory.
+        """
+        return self._store
+
     def result_from_name(self, name):
         """
         Parameters
@@ -74,22 +131,60 @@ class ParametricSolver(abc.ABC):
             If the no sample with the given name exists, or if the sample is
             unsolved, returns None.
         """
-        target_sample = None
-        for sample in self._samples:
-            if sample.name == name:
-                target_sample = sample
-                break
+        target_sample = self._sample_from_name(name)
+        if target_sample is None or not self._is_cached(target_sample):
+            return None
+
+        return self._store.get(self._fingerprint(target_sample))
 
-        if target_sample:
-            filepath = os.path.join(self._write_path, self._eval_filename(target_sample))
-            if os.path.exists(filepath):
-                with open(filepath, "rb") as f:
-                    print(f"Loading cached result from {filepath} ...")
-                    return pickle.load(f)
+    def result_path(self, name):
+        """
+        Returns
+        -------
+        str
+            The path of the cached result of the sample with the given name, which can be read with
+            result_store.load_result. If no sample with the given name exists, or if the sample is unsolved,
+            returns None.
+        """
+        target_sample = self._sample_from_name(name)
+        if target_sample is None or not self._is_cached(target_sample):
+            return None
 
-        return None
+        return self._store.filepath(self._fingerprint(target_sample))
 
-    def solve(self, read_cache=True, verbose=False, kill=False):
+    def result_summary(self, name):
+        """
+        Returns
+        -------
+        dict
+            The summary values stored with the result of the sample with the given name.
+            If no sample with the given name exists, or if the sample is unsolved, returns None.
+        """
+        target_sample = self._sample_from_name(name)
+        if target_sample is None or not self._is_cached(target_sample):
+            return None
+
+        return self._store.summary(self._fingerprint(target_sample))
+
+    def update_result_summary(self, name, **values):
+        """
+        Adds the given values to the summary stored with the result of the sample with the given name.
+
+        Raises
+        ------
+        KeyError
+            If no sample with the given name exists, or if the sample is unsolved.
+        """
+        target_sample = self._sample_from_name(name)
+        if target_sample is None:
+            raise KeyError(f"No sample with name {name}.")
+        if not self._is_cached(target_sample):
+            raise KeyError(f"Sample {name} is unsolved.")
+
+        self._store.update_summary(self._fingerprint(target_sample), **values)
+
+    def solve(self, read_cache=True, verbose=False, kill=False, instances=1, port=50052, run_location=None,
+              max_attempts=3, backoff=10.0, retry_quarantined=False):
         """
         Solves all added samples and writes the results to the write directory.
 
@@ -103,38 +198,204 @@ class ParametricSolver(abc.ABC):
             If True, prints additional output for debugging to the console,
             otherwise only prints minimal output.
 
+        kill: bool, optional
+            If True, kills all running ANSYS processes before launching MAPDL.
+
+        instances: int, optional
+            The number of MAPDL instances that solve samples concurrently.
+            If greater than 1, each instance is launched on its own port and in its own run location,
+            and the instances take unsolved samples from a shared queue.
+
+        port: int, optional
+            The port of the first MAPDL instance when solving concurrently.
+            Instance i is launched on port + i.
+
+        run_location: str, optional
+            The directory in which the run locations of the concurrent MAPDL instances are created.
+            Defaults to the run location passed to the solver, or the working directory.
+
+        max_attempts: int, optional
+            The number of failed attempts after which a sample is quarantined and skipped in this and later runs.
+            Only attempts failing with one of TRANSIENT_ERRORS are retried, other failures quarantine the sample
+            immediately.
+
+        backoff: float, optional
+            The delay in seconds after a sample's first failed attempt. Doubles with every further failed attempt.
+
+        retry_quarantined: bool, optional
+            If True, samples quarantined by previous runs are attempted again.
+
         Notes
         -----
         This method can also be used to load and access the existing results if they have already been solved
         at the provided samples and are located in the write directory.
+
+        Progress, failures and timings of each sample are checkpointed in the write directory,
+        see solve_statistics.
         """
-        i = 1
+        self._executor = SolveExecutor(
+            checkpoint_path=os.path.join(self._write_path, self.CHECKPOINT_FILENAME),
+            max_attempts=max_attempts,
+            backoff=backoff,
+            transient_errors=TRANSIENT_ERRORS)
+
         n = len(self._samples)
+        pending = []
 
-        for sample in self._samples:
-            print(f"Solving [{i}/{n}]")
+        for i, sample in enumerate(self._samples):
+            if read_cache and self._is_cached(sample):
+                print(f"Cached result available [{i + 1}/{n}]: {sample}")
+                continue
+
+            if self._executor.is_quarantined(self._fingerprint(sample)):
+                if not retry_quarantined:
+                    print(f"Sample quarantined by a previous run [{i + 1}/{n}]: {sample}")
+                    continue
+                self._executor.release(self._fingerprint(sample))
+
+            pending.append(sample)
+
+        if instances > 1:
+            self._solve_concurrent(pending, instances, port, run_location, verbose=verbose, kill=kill)
+            return
+
+        def on_failure(e):
+            # The instance is in an unknown state after any failure, and may still hold its license and port.
+            print(f"{type(e).__name__}. Relaunching MAPDL ...")
+            util.exit_mapdl(util.current_mapdl(), port=self._mapdl_kwargs.get('port'))
+            util.clear_mapdl()
+
+        for i, sample in enumerate(pending):
+            print(f"Solving [{i + 1}/{len(pending)}]")
             print(f"Sample: {sample}")
 
-            filepath = os.path.join(self._write_path, self._eval_filename(sample))
-            if read_cache and os.path.exists(filepath):
-                print(f"Cached result available.")
-            else:
-                while True:
-                    try:
-                        result = self._solve_sample(
-                                sample,
-                                verbose=verbose,
-                                kill=kill)
-                        break
-                    except MapdlExitedError:
-                        print("MAPDL Exited Error. Continuing ...")
-                        util.clear_mapdl()
-                        
-                with open(filepath, "wb") as f:
-                    print(f"Caching result at {filepath} ...")
-                    pickle.dump(result, f)
-
-            i += 1
+            result = self._executor.run(
+                self._fingerprint(sample),
+                lambda: self._solve_sample(sample, verbose=verbose, kill=kill),
+                on_failure=on_failure)
+
+            if result is not None:
+                self._write_result(sample, result)
+
+    def solve_statistics(self):
+        """
+        Returns
+        -------
+        pd.DataFrame
+            The status, attempts, failures, last error and timings of every sample attempted by the
+            last call to solve, or by previous runs in the same write directory.
+        """
+        if self._executor is None:
+            self._executor = SolveExecutor(checkpoint_path=os.path.join(self._write_path, self.CHECKPOINT_FILENAME))
+
+        return self._executor.statistics()
+
+    def _solve_concurrent(self, samples, instances, port, run_location, verbose=False, kill=False):
+        if kill:
+            util.kill_ansys()
+
+        if run_location is None:
+            run_location = self._mapdl_kwargs.get('run_location') or os.getcwd()
+
+        # Samples share input files, so each input is processed once before the instances start reading them.
+        for inp_file in dict.fromkeys(sample.input for sample in samples):
+            self._prepare_input(inp_file)
+
+        sample_queue = queue.Queue()
+        for sample in samples:
+            sample_queue.put(sample)
+
+        print(f"Solving {len(samples)} samples on {instances} MAPDL instances ...")
+
+        errors = []
+        workers = []
+        for i in range(instances):
+            worker = threading.Thread(
+                target=self._solve_worker,
+                args=(i, sample_queue, port + i, os.path.join(run_location, f"instance_{i}"), verbose, errors),
+                name=f"mapdl_{i}")
+            worker.start()
+            workers.append(worker)
+
+        for worker in workers:
+            worker.join()
+
+        if errors:
+            raise errors[0]
+
+    def _solve_worker(self, worker_id, sample_queue, port, run_location, verbose, errors):
+        os.makedirs(run_location, exist_ok=True)
+        mapdl_kwargs = dict(self._mapdl_kwargs, port=port, run_location=run_location)
+        mapdl_inst = None
+
+        try:
+            while True:
+                try:
+                    sample = sample_queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                print(f"[Instance {worker_id}] Solving sample {sample} ({sample_queue.qsize()} remaining) ...")
+
+                def attempt():
+                    nonlocal mapdl_inst
+                    if mapdl_inst is None:
+                        mapdl_inst = util.init_mapdl(launcher=self._launcher, **mapdl_kwargs)
+
+                    return self._solve_sample(sample, verbose=verbose, mapdl_inst=mapdl_inst, prepare_input=False)
+
+                def on_failure(e):
+                    # The instance is in an unknown state after any failure, and may still hold the port.
+                    nonlocal mapdl_inst
+                    print(f"[Instance {worker_id}] {type(e).__name__}. Relaunching MAPDL ...")
+                    util.exit_mapdl(mapdl_inst, port=port)
+                    mapdl_inst = None
+
+                result = self._executor.run(self._fingerprint(sample), attempt, on_failure=on_failure)
+                if result is not None:
+                    self._write_result(sample, result)
+        except Exception as e:
+            print(f"[Instance {worker_id}] Failed: {e}")
+            errors.append(e)
+        finally:
+            util.exit_mapdl(mapdl_inst, port=port)
+
+    def _write_result(self, sample, result):
+        filename = self._eval_filename(sample)
+        if self._columnar and not isinstance(result, RSTResult):
+            filename = os.path.splitext(filename)[0] + COLUMNAR_EXT
+        print(f"Caching result at {os.path.join(self._write_path, filename)} ...")
+        self._store.put(self._fingerprint(sample), result, filename=filename, name=str(sample))
+
+    def _is_cached(self, sample):
+        key = self._fingerprint(sample)
+        if key in self._store:
+            return True
+
+        # Results cached before the manifest was introduced, or whose manifest entry was lost,
+        # are added on first access.
+        filename = self._eval_filename(sample)
+        for candidate in [filename, os.path.splitext(filename)[0] + COLUMNAR_EXT]:
+            if is_complete_result(os.path.join(self._write_path, candidate)):
+                self._store.register(key, candidate, name=str(sample))
+                return True
+
+        return False
+
+    def _sample_from_name(self, name):
+        if self._name_index is None:
+            self._name_index = {}
+            for sample in self._samples:
+                self._name_index.setdefault(getattr(sample, 'name', None), sample)
+
+        return self._name_index.get(name)
+
+    def _append_sample(self, sample):
+        self._samples.append(sample)
+        self._name_index = None
+
+    def _fingerprint(self, sample):
+        return os.path.splitext(self._eval_filename(sample))[0]
 
     @abc.abstractmethod
     def _setup_solve(self, sample, mat_ids, mapdl_inst):
@@ -144,16 +405,23 @@ class ParametricSolver(abc.ABC):
     def _eval_filename(self, sample):
         pass
 
-    def _solve_sample(self, sample, verbose=False, kill=False):
-        _mapdl = get_mapdl(kill=kill, **self._mapdl_kwargs)
-
-        if not inp.is_inp_valid(sample.input):
-            print(f"Unprocessed input file: {sample.input}")
+    def _prepare_input(self, inp_file):
+        if not inp.is_inp_valid(inp_file):
+            print(f"Unprocessed input file: {inp_file}")
             print("Processing ...")
-            inp.process_invalid_inp(sample.input)
+            inp.process_invalid_inp(inp_file)
+
+    def _solve_sample(self, sample, verbose=False, kill=False, mapdl_inst=None, prepare_input=True):
+        if mapdl_inst is None:
+            _mapdl = get_mapdl(kill=kill, launcher=self._launcher, **self._mapdl_kwargs)
+        else:
+            _mapdl = mapdl_inst
+
+        if prepare_input:
+            self._prepare_input(sample.input)
 
         _mapdl.clear()
-        _mapdl.input(sample.input)
+        self._load_base_model(sample.input, _mapdl)
 
         self._setup_solve(sample, sample.mat_ids, _mapdl)
 
@@ -166,7 +434,37 @@ class ParametricSolver(abc.ABC):
 
         _mapdl.finish()
 
-        return APDLResult(_mapdl.result)
+        if self._lazy_results:
+            return RSTResult(self._copy_result_file(sample, _mapdl))
+
+        history_path = os.path.join(self._store.path, f"{self._fingerprint(sample)}.history") if self._history else None
+        return APDLResult(_mapdl.result, history_path=history_path)
+
+    def _copy_result_file(self, sample, mapdl_inst):
+        os.makedirs(self._store.path, exist_ok=True)
+        rst_path = os.path.join(self._store.path, f"{self._fingerprint(sample)}.rst")
+        temp_path = f"{rst_path}.{uuid.uuid4().hex}.tmp"
+
+        print(f"Copying result file {mapdl_inst.result_file} to {rst_path} ...")
+        shutil.copy2(mapdl_inst.result_file, temp_path)
+        os.replace(temp_path, rst_path)
+        return rst_path
+
+    def _load_base_model(self, inp_file, mapdl_inst):
+        if not self._snapshots:
+            mapdl_inst.input(inp_file)
+            return
+
+        snapshot = f"base_{_file_to_checksum(inp_file, digits=16)}"
+        snapshot_path = os.path.join(mapdl_inst.directory, f"{snapshot}.db")
+
+        if os.path.exists(snapshot_path):
+            print(f"Resuming base model snapshot {snapshot_path} ...")
+            mapdl_inst.resume(snapshot, "db")
+        else:
+            mapdl_inst.input(inp_file)
+            print(f"Saving base model snapshot {snapshot_path} ...")
+            mapdl_inst.save(snapshot, "db", "", "ALL")
 
 
 class BilinearSolver(ParametricSolver):
@@ -191,7 +489,7 @@ class BilinearSolver(ParametricSolver):
         tangent_mod: int
             The tangent modulus in the input file's units.
         """
-        self.samples.append((elastic_mod, yield_strength, tangent_mod))
+        self._append_sample((elastic_mod, yield_strength, tangent_mod))
 
     def _eval_filename(self, sample):
         return f"e{_num_to_identifier(sample[0])}_" \
@@ -231,7 +529,7 @@ class PowerLawSolver(ParametricSolver):
 
         stress = yield_strength * (plastic_strain ** exponent)
         """
-        self.samples.append((elastic_mod, yield_strength, exponent))
+        self._append_sample((elastic_mod, yield_strength, exponent))
 
     def _eval_filename(self, sample):
         return f"e{_num_to_identifier(sample[0])}_" \
@@ -254,8 +552,27 @@ class BilinearThermalSolver(ParametricSolver):
         - Pressure loads
         - Thermal loads
     """
-    def __init__(self, **kwargs):
+    def __init__(self, dump_path=None, map_cache_path=None, **kwargs):
+        """
+        Parameters
+        ----------
+        dump_path: str, optional
+            If provided, the APDL commands that set up each sample are written to
+            <dump_path>/<sample>.mac for inspection.
+
+        map_cache_path: str, optional
+            The directory in which the surface loads produced by mapping pressure files onto components are cached.
+            Defaults to <write_path>/map_cache.
+
+        **kwargs:
+            Keyword arguments passed to ParametricSolver.
+        """
         super().__init__(**kwargs)
+        self._dump_path = dump_path
+
+        if map_cache_path is None:
+            map_cache_path = os.path.join(self._write_path, 'map_cache')
+        self._map_cache_path = os.path.abspath(map_cache_path)
 
     def add_sample(self, sample):
         """
@@ -267,12 +584,53 @@ class BilinearThermalSolver(ParametricSolver):
             Instance of BilinearThermalSample that specifies the properties of the sample.
             All properties are optional; to leave a property unchanged from the provided input file, omit setting it in the sample.
         """
-        self.samples.append(sample)
+        self._append_sample(sample)
 
     def _eval_filename(self, sample):
         return f"{sample}.pkl"
 
     def _setup_solve(self, sample, mat_ids, mapdl_inst):
+        map_files = [self._map_cache_file(sample.input, *pressure) for pressure in sample.pressure_loads]
+        unmapped = {map_file: os.path.join(self._map_cache_path, "temp_" + str(uuid.uuid4()) + '.txt')
+                    for map_file in map_files if not os.path.exists(map_file)}
+        commands = self._setup_commands(sample, mat_ids, map_files, unmapped)
+
+        if self._dump_path:
+            os.makedirs(self._dump_path, exist_ok=True)
+            dump_file = os.path.join(self._dump_path, f"{sample}.mac")
+            print(f"Writing setup commands to {dump_file} ...")
+            with open(dump_file, 'w') as f:
+                f.write('\n'.join(commands) + '\n')
+
+        print(f"Mapped pressure loads cached: {len(map_files) - len(unmapped)}/{len(map_files)}")
+        print(f"Sending {len(commands)} setup commands for material ids {tuple(mat_ids)} ...")
+
+        os.makedirs(self._map_cache_path, exist_ok=True)
+        try:
+            mapdl_inst.input_strings('\n'.join(commands))
+
+            for map_file, temp_file in unmapped.items():
+                if os.path.exists(temp_file):
+                    print(f"Caching mapped pressure load at {map_file} ...")
+                    os.replace(temp_file, map_file)
+        finally:
+            for temp_file in unmapped.values():
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+
+    def _map_cache_file(self, inp_file, filename, component):
+        # Pressure loads that were already mapped onto the component (see processing.write_pressure_load)
+        # are read as they are.
+        if filename.endswith(MAPPED_PRESSURE_EXT):
+            return os.path.abspath(filename)
+
+        pressure_checksum = _file_to_checksum(filename, digits=16)
+        mesh_checksum = _file_to_checksum(inp_file, digits=16)
+        return os.path.join(self._map_cache_path, f"{component}_{pressure_checksum}_{mesh_checksum}.map")
+
+    def _setup_commands(self, sample, mat_ids, map_files, unmapped):
+        commands = ["/PREP7"]
+
         for mat_id in mat_ids:
             for prop in MatProp:
                 value = sample.get_property(prop)
@@ -280,28 +638,34 @@ class BilinearThermalSolver(ParametricSolver):
                     continue
 
                 if isinstance(value, np.ndarray) and value.shape[0] > 1:
-                    _set_temperature_table(value, prop.value, mat_id, mapdl_inst)
+                    commands += _temperature_table_commands(value, prop.value, mat_id)
                 else:
-                    _set_property_value(value, prop.value, mat_id, mapdl_inst)
+                    commands += _property_value_commands(value, prop.value, mat_id)
 
             if sample.hill is not None:
-                _set_hill_table(sample.hill, mat_id, mapdl_inst)
+                commands += _hill_table_commands(sample.hill, mat_id)
 
             if sample.plasticity is not None:
                 if isinstance(sample.plasticity, np.ndarray) and sample.plasticity.shape[0] > 1:
-                    _set_bilinear_plasticity_table(sample.plasticity, mat_id, mapdl_inst)
+                    commands += _bilinear_plasticity_table_commands(sample.plasticity, mat_id)
                 else:
-                    _set_bilinear_plasticity_values(sample.plasticity[0], sample.plasticity[1], mat_id, mapdl_inst)
+                    commands += _bilinear_plasticity_table_commands(
+                        np.array([[22, sample.plasticity[0], sample.plasticity[1]]]), mat_id)
+            else:
+                commands += _remove_plasticity_commands(mat_id)
+
+        commands.append("FINISH")
+
+        for pressure, map_file in zip(sample.pressure_loads, map_files):
+            if map_file in unmapped:
+                commands += _pressure_load_commands(*pressure, unmapped[map_file])
             else:
-                _remove_plasticity(mat_id, mapdl_inst)
+                commands += _solu_input_commands(map_file)
 
-        if sample.pressure_loads:
-            for pressure in sample.pressure_loads:
-                _add_pressure_load(*pressure, mapdl_inst)
+        for thermal in sample.thermal_loads:
+            commands += _thermal_load_commands(thermal)
 
-        if sample.thermal_loads:
-            for thermal in sample.thermal_loads:
-                _add_thermal_load(thermal, mapdl_inst)
+        return commands
 
 
 class BilinearThermalSample:
@@ -594,28 +958,14 @@ class MatProp(enum.Enum):
 def _set_property_value(value, mat_prop, mat_id, mapdl_inst):
     print(f"Setting property {mat_prop} for material id {mat_id} ...")
     print(f"Value: {value}")
-
-    mapdl_inst.prep7()
-    mapdl_inst.mp(mat_prop, mat_id, value)
-    mapdl_inst.finish()
+    _run_prep7_commands(_property_value_commands(value, mat_prop, mat_id), mapdl_inst)
 
 
 def _set_temperature_table(table, mat_prop, mat_id, mapdl_inst):
     print(f"Setting temperature table property {mat_prop} for material id {mat_id} ...")
     print("Table:")
     print(table)
-
-    mapdl_inst.prep7()
-
-    mapdl_inst.mptemp()
-    for i, temp in enumerate(table[:, 0]):
-        print(f"Adding table temperature: {i + 1}, {temp}")
-        mapdl_inst.mptemp(i + 1, temp)
-    for i, value in enumerate(table[:, 1]):
-        print(f"Adding table {mat_prop} value: {i + 1}, {value}")
-        mapdl_inst.mpdata(mat_prop, mat_id, i + 1, value)
-
-    mapdl_inst.finish()
+    _run_prep7_commands(_temperature_table_commands(table, mat_prop, mat_id), mapdl_inst)
 
 
 def _set_bilinear_plasticity_values(yield_strength, tangent_mod, mat_id, mapdl_inst):
@@ -626,84 +976,129 @@ def _set_bilinear_plasticity_table(table, mat_id, mapdl_inst):
     print(f"Setting bilinear plasticity for material id {mat_id} ...")
     print("Table:")
     print(table)
+    _run_prep7_commands(_bilinear_plasticity_table_commands(table, mat_id), mapdl_inst)
 
-    mapdl_inst.prep7()
 
-    n = table.shape[0]
+def _set_hill_table(table, mat_id, mapdl_inst):
+    print(f"Setting hill table for material id {mat_id} ...")
+    print("Table:")
+    print(table)
+    _run_prep7_commands(_hill_table_commands(table, mat_id), mapdl_inst)
 
-    mapdl_inst.tbdele("PLAS", mat_id)
-    mapdl_inst.tb("PLAS", mat_id, n, "", "BISO")
 
-    for i in range(n):
-        mapdl_inst.tbtemp(table[i, 0])
-        mapdl_inst.tbdata(1, table[i, 1], table[i, 2])
+def _set_power_law_plasticity_values(yield_strength, exponent, mat_id, mapdl_inst):
+    print(f"Setting power law plasticity for material id {mat_id}:")
+    print(f"Yield strength = {yield_strength}")
+    print(f"Exponent = {exponent}")
+    _run_prep7_commands(_power_law_plasticity_commands(yield_strength, exponent, mat_id), mapdl_inst)
 
-    mapdl_inst.finish()
 
+def _remove_plasticity(mat_id, mapdl_inst):
+    print(f"Removing plasticity for material id {mat_id} ...")
+    _run_prep7_commands(_remove_plasticity_commands(mat_id), mapdl_inst)
 
-def _set_hill_table(table, mat_id, mapdl_inst):
-    print(f"Setting hill table for material id {mat_id} ...")
-    print("Table:")
-    print(table)
 
-    mapdl_inst.prep7()
+def _run_prep7_commands(commands, mapdl_inst):
+    mapdl_inst.input_strings('\n'.join(["/PREP7", *commands, "FINISH"]))
+
+
+def _property_value_commands(value, mat_prop, mat_id):
+    return [f"MP,{mat_prop},{mat_id},{_apdl_num(value)}"]
+
+
+def _temperature_table_commands(table, mat_prop, mat_id):
+    commands = ["MPTEMP"]
+    for i, temp in enumerate(table[:, 0]):
+        commands.append(f"MPTEMP,{i + 1},{_apdl_num(temp)}")
+    for i, value in enumerate(table[:, 1]):
+        commands.append(f"MPDATA,{mat_prop},{mat_id},{i + 1},{_apdl_num(value)}")
+
+    return commands
 
+
+def _bilinear_plasticity_table_commands(table, mat_id):
     n = table.shape[0]
+    commands = [f"TBDELE,PLAS,{mat_id}", f"TB,PLAS,{mat_id},{n},,BISO"]
+
+    for i in range(n):
+        commands.append(f"TBTEMP,{_apdl_num(table[i, 0])}")
+        commands.append(f"TBDATA,1,{_apdl_num(table[i, 1])},{_apdl_num(table[i, 2])}")
 
-    mapdl_inst.tbdele("HILL", mat_id)
-    mapdl_inst.tb("HILL", mat_id, n)
+    return commands
+
+
+def _hill_table_commands(table, mat_id):
+    n = table.shape[0]
+    commands = [f"TBDELE,HILL,{mat_id}", f"TB,HILL,{mat_id},{n}"]
 
     for i in range(n):
-        mapdl_inst.tbtemp(table[i, 0])
-        mapdl_inst.tbdata(1, table[i, 1], table[i, 2], table[i, 3], table[i, 4], table[i, 5], table[i, 6])
+        commands.append(f"TBTEMP,{_apdl_num(table[i, 0])}")
+        commands.append("TBDATA,1," + ",".join(_apdl_num(value) for value in table[i, 1:7]))
 
-    mapdl_inst.finish()
+    return commands
 
 
-def _set_power_law_plasticity_values(yield_strength, exponent, mat_id, mapdl_inst):
-    print(f"Setting power law plasticity for material id {mat_id}:")
-    print(f"Yield strength = {yield_strength}")
-    print(f"Exponent = {exponent}")
+def _power_law_plasticity_commands(yield_strength, exponent, mat_id):
+    return [
+        f"TBDELE,PLAS,{mat_id}",
+        f"TB,PLAS,{mat_id},,,NLISO",
+        f"TBDATA,1,{_apdl_num(yield_strength)},{_apdl_num(exponent)}"
+    ]
 
-    mapdl_inst.prep7()
 
-    mapdl_inst.tbdele("PLAS", mat_id)
-    mapdl_inst.tb("PLAS", mat_id, "", "", "NLISO")
-    mapdl_inst.tbdata(1, yield_strength, exponent)
+def _remove_plasticity_commands(mat_id):
+    return [f"TBDELE,PLAS,{mat_id}"]
 
-    mapdl_inst.finish()
 
+def _pressure_load_commands(filename, component, map_file):
+    return [
+        "/MAP",
+        "FTYPE,CSV,0",
+        f"READ,{_apdl_path(filename)},1,,2,3,4,5",
+        f"TARGET,{component}",
+        "MAP",
+        f"WRITEMAP,{_apdl_path(map_file)}",
+        "FINISH",
+        *_solu_input_commands(map_file)
+    ]
 
-def _remove_plasticity(mat_id, mapdl_inst):
-    print(f"Removing plasticity for material id {mat_id} ...")
-    mapdl_inst.prep7()
-    mapdl_inst.tbdele("PLAS", mat_id)
-    mapdl_inst.finish()
 
+def _thermal_load_commands(filename):
+    return _solu_input_commands(filename)
+
+
+def _solu_input_commands(filename):
+    return [
+        "/SOLU",
+        _input_command(filename),
+        "FINISH"
+    ]
+
+
+def _input_command(filename):
+    root, ext = os.path.splitext(_apdl_path(filename))
+    return f"/INPUT,'{root}','{ext[1:]}'"
 
-def _add_pressure_load(filename, component, mapdl_inst):
-    print(f"Applying pressure load at {filename} to {component} ...")
-    name = os.path.basename(filename)
 
-    mapdl_inst.slashmap()
+def _apdl_path(filename):
+    return filename.replace('\\', '/')
 
-    mapdl_inst.ftype("CSV", 0)
-    mapdl_inst.read(filename, 1, "", 2, 3, 4, 5)
-    mapdl_inst.target(component)
-    mapdl_inst.map()
-    mapdl_inst.show()
-    mapdl_inst.plgeom()
+
+def _apdl_num(value):
+    return repr(float(value))
+
+
+def _add_pressure_load(filename, component, mapdl_inst):
+    print(f"Applying pressure load at {filename} to {component} ...")
 
     temp_file = os.path.join(os.getcwd(), "temp_" + str(uuid.uuid4()) + '.txt')
     print("Temp file =", temp_file)
-    mapdl_inst.writemap(temp_file)
-    mapdl_inst.finish()
 
-    mapdl_inst.slashsolu()
-    mapdl_inst.input(temp_file)
-    mapdl_inst.finish()
-
-    os.remove(temp_file)
+    try:
+        mapdl_inst.input_strings('\n'.join(_pressure_load_commands(filename, component, temp_file)))
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
 
 
 def _add_thermal_load(filename, mapdl_inst):
@@ -790,11 +1185,7 @@ def _add_thermal_load(filename, mapdl_inst):
     #
     # mapdl_inst.finish()
 
-    filename = filename.replace('\\', '/')
-
-    mapdl_inst.slashsolu()
-    mapdl_inst.input(filename)
-    mapdl_inst.finish()
+    mapdl_inst.input_strings('\n'.join(_thermal_load_commands(filename)))
 
 
 class NodeContext:
@@ -936,10 +1327,4 @@ def _num_to_identifier(num):
 
 
 def _file_to_checksum(file_path, digits=-1):
-    sha256_hash = hashlib.sha256()
-
-    with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
-
-    return sha256_hash.hexdigest()[:digits]
+    return fingerprints.checksum(file_path)[:digits]
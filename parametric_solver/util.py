@@ -10,7 +10,7 @@ PARENT_DIR = os.path.dirname(CURR_DIR)
 sys.path.append(PARENT_DIR)
 
 import materials.presets as sampling
-import linearization.surface as surface
+from linearization.plan import get_plan
 import conductivity_effect.solve
 from linearization.linearization import von_mises, von_mises_strain
 from materials.presets import SampleMaterial
@@ -55,11 +55,11 @@ def plot_temperature(df, component, flat):
 def _plot_df_prop(df_vals, flat, col=None):
     df_vals = df_vals.dropna()
     
-    loc1, loc2 = surface.pair_nodes(
-        None,
+    loc1, loc2 = get_plan(
         CURVED_TOP_SURFACE_PATH if not flat else FLAT_TOP_SURFACE_PATH,
-        CURVED_BOTTOM_SURFACE_PATH if not flat else FLAT_BOTTOM_SURFACE_PATH
-    )
+        CURVED_BOTTOM_SURFACE_PATH if not flat else FLAT_BOTTOM_SURFACE_PATH,
+        CURVED_ALL_LOCS_PATH if not flat else FLAT_ALL_LOCS_PATH
+    ).paired_locations()
 
     locs = pd.concat([loc1, loc2])
 
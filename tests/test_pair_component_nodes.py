@@ -0,0 +1,73 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+CURR_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(CURR_DIR)
+sys.path.append(PARENT_DIR)
+
+from linearization.pair_component_nodes import LSANodePairer, TSNodePairer, SPARSE_PAIRING_CANDIDATES
+
+
+def _cost(nodes1, nodes2, paired):
+    locations = pd.concat([nodes1, nodes2], axis=0)
+    return np.linalg.norm(locations.loc[paired[:, 0]].to_numpy() - locations.loc[paired[:, 1]].to_numpy(), axis=1).sum()
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_sparse_pairing_gap_on_random_points(seed):
+    rng = np.random.default_rng(seed)
+    nodes1 = pd.DataFrame(rng.random((800, 3)), index=np.arange(800))
+    nodes2 = pd.DataFrame(rng.random((1000, 3)), index=np.arange(1000, 2000))
+    pairer = LSANodePairer.from_locations(nodes1, nodes2)
+
+    dense = _cost(nodes1, nodes2, pairer.pair())
+    sparse = _cost(nodes1, nodes2, pairer.pair(num_closest=SPARSE_PAIRING_CANDIDATES))
+    assert dense <= sparse <= dense * 1.001
+
+
+def test_sparse_pairing_is_optimal_on_shell_surfaces():
+    rng = np.random.default_rng(0)
+    angle, height = np.meshgrid(np.linspace(0, np.pi / 3, 40), np.linspace(0, 5, 30))
+    angle, height = angle.ravel(), height.ravel()
+
+    def surface(radius):
+        locations = np.column_stack([radius * np.cos(angle), radius * np.sin(angle), height])
+        return locations + rng.normal(0, 0.01, locations.shape)
+
+    nodes1 = pd.DataFrame(surface(6.5), index=np.arange(len(angle)))
+    nodes2 = pd.DataFrame(surface(7.0), index=np.arange(len(angle)) + 10000)
+    pairer = LSANodePairer.from_locations(nodes1, nodes2)
+
+    def by_first(paired):
+        return paired[np.argsort(paired[:, 0])]
+
+    np.testing.assert_array_equal(by_first(pairer.pair()), by_first(pairer.pair(num_closest=SPARSE_PAIRING_CANDIDATES)))
+
+
+def _hex_mesh(nx, ny, nz):
+    ids = np.arange(nx * ny * nz).reshape(nx, ny, nz) + 1
+    x, y, z = np.meshgrid(np.arange(nx), np.arange(ny), np.arange(nz), indexing='ij')
+    locations = pd.DataFrame(np.column_stack([x.ravel(), y.ravel(), z.ravel()]).astype(float), index=ids.ravel())
+
+    corners = [ids[i:nx - 1 + i, j:ny - 1 + j, k:nz - 1 + k] for i in (0, 1) for j in (0, 1) for k in (0, 1)]
+    connectivity = np.column_stack([corner.ravel() for corner in corners])
+    return locations, connectivity, ids[:, :, 0].ravel(), ids[:, :, -1].ravel()
+
+
+def test_node_graph_cache_is_rebuilt_for_another_mesh(tmp_path):
+    cache_path = os.path.join(tmp_path, 'graph.npz')
+
+    locations, connectivity, bottom, top = _hex_mesh(4, 3, 3)
+    graph = TSNodePairer(bottom, top, locations, connectivity).build_node_graph(cache_path)
+    cached = TSNodePairer(bottom, top, locations, connectivity).build_node_graph(cache_path)
+    assert (graph != cached).nnz == 0
+
+    scaled = TSNodePairer(bottom, top, locations * 2.0, connectivity).build_node_graph(cache_path)
+    np.testing.assert_allclose(scaled.toarray(), 2.0 * graph.toarray())
+
+    locations, connectivity, bottom, top = _hex_mesh(5, 3, 3)
+    refined = TSNodePairer(bottom, top, locations, connectivity).build_node_graph(cache_path)
+    assert refined.shape == (45, 45)
@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+import numpy as np
+import pytest
+
+CURR_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(CURR_DIR)
+sys.path.append(PARENT_DIR)
+
+pytest.importorskip('ansys.mapdl.core')
+pytest.importorskip('psutil')
+
+from ansys.mapdl.core.errors import MapdlExitedError
+from parametric_solver.solver import BilinearThermalSolver, BilinearThermalSample, MatProp
+
+# far from the default MAPDL ports, since processes still listening on a port are killed after each instance
+PORT = 59150
+N_NODES = 8
+
+
+class FakeResult:
+    n_results = 1
+    time_values = np.array([1.0])
+
+    def nodal_stress(self, i):
+        return np.arange(1, N_NODES + 1), np.ones((N_NODES, 6))
+
+    def nodal_elastic_strain(self, i):
+        return np.arange(1, N_NODES + 1), np.ones((N_NODES, 7))
+
+    def nodal_plastic_strain(self, i):
+        raise ValueError
+
+    def nodal_displacement(self, i):
+        return np.arange(1, N_NODES + 1), np.zeros((N_NODES, 3))
+
+
+class FakeMapdl:
+    """
+    Records the commands sent to it, and returns a constant result.
+    """
+    def __init__(self, crash=False, **kwargs):
+        self.kwargs = kwargs
+        self.directory = kwargs['run_location']
+        self.result = FakeResult()
+        self.crash = crash
+        self.solved = []
+        self.exited = False
+
+    def solve(self, verbose=False):
+        if self.crash:
+            raise MapdlExitedError("MAPDL exited.")
+        self.solved.append(threading.current_thread().name)
+
+    def exit(self):
+        self.exited = True
+        if self.crash:
+            raise MapdlExitedError("MAPDL already exited.")
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: ""
+
+
+class FakeLauncher:
+    def __init__(self, crashes=0):
+        self.instances = []
+        self._crashes = crashes
+        self._lock = threading.Lock()
+
+    def __call__(self, **kwargs):
+        with self._lock:
+            crash = len(self.instances) < self._crashes
+            instance = FakeMapdl(crash=crash, **kwargs)
+            self.instances.append(instance)
+            return instance
+
+
+def _solver(tmp_path, launcher, n_samples):
+    inp_path = os.path.join(tmp_path, 'base.inp')
+    with open(inp_path, 'w') as f:
+        f.write("/prep7\nfini\n")
+
+    solver = BilinearThermalSolver(write_path=os.path.join(tmp_path, 'out'), launcher=launcher)
+    for i in range(n_samples):
+        sample = BilinearThermalSample()
+        sample.name = f"sample{i}"
+        sample.input = inp_path
+        sample.set_property(MatProp.ELASTIC_MODULUS, 1e5 + i)
+        solver.add_sample(sample)
+
+    return solver
+
+
+def test_concurrent_solve_uses_one_instance_per_port(tmp_path):
+    launcher = FakeLauncher()
+    solver = _solver(tmp_path, launcher, 6)
+    solver.solve(instances=3, port=PORT, run_location=os.path.join(tmp_path, 'run'))
+
+    assert all(solver.result_from_name(f"sample{i}") is not None for i in range(6))
+    assert sorted(instance.kwargs['port'] for instance in launcher.instances) == [PORT, PORT + 1, PORT + 2]
+    assert len(set(instance.directory for instance in launcher.instances)) == 3
+    assert sum(len(instance.solved) for instance in launcher.instances) == 6
+    assert all(instance.exited for instance in launcher.instances)
+
+
+def test_concurrent_solve_relaunches_crashed_instances(tmp_path):
+    launcher = FakeLauncher(crashes=2)
+    solver = _solver(tmp_path, launcher, 4)
+    solver.solve(instances=2, port=PORT, run_location=os.path.join(tmp_path, 'run'), backoff=0.0)
+
+    assert all(solver.result_from_name(f"sample{i}") is not None for i in range(4))
+    assert all(instance.exited for instance in launcher.instances)
+    assert sum(len(instance.solved) for instance in launcher.instances) == 4
+    assert solver.solve_statistics()['status'].eq('completed').all()
@@ -0,0 +1,43 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+CURR_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(CURR_DIR)
+sys.path.append(PARENT_DIR)
+
+from linearization.vinterp import interpolation_matrix, surface_interpolation_matrix
+
+
+def _cool_surf3():
+    raw_data = pd.read_csv(os.path.join(PARENT_DIR, 'inp', 'example', 'pressure', 'cool-surf3.out'), index_col=0)
+    raw_locs = raw_data.iloc[:, 0:3].to_numpy() * 1000
+    target_locs = pd.read_csv(os.path.join(PARENT_DIR, 'inp', 'nodes', 'cool_surf3.loc'), index_col=0, header=None)
+    return raw_locs, target_locs.to_numpy(dtype=float)
+
+
+def _inside_fraction(matrix):
+    # rows of targets inside a triangle or tetrahedron hold more than the single weight of the nearest fallback
+    return np.mean(np.diff(matrix.indptr) > 1)
+
+
+def test_surface_targets_inside_hull():
+    raw_locs, target_locs = _cool_surf3()
+
+    assert _inside_fraction(interpolation_matrix(raw_locs, target_locs)) < 0.05
+    assert _inside_fraction(surface_interpolation_matrix(raw_locs, target_locs)) > 0.95
+
+
+def test_surface_interpolation_is_linear():
+    rng = np.random.default_rng(0)
+    angle, height = rng.uniform(0, np.pi / 3, 2000), rng.uniform(0, 5, 2000)
+    xin = np.column_stack([6.5 * np.cos(angle), 6.5 * np.sin(angle), height])
+    angle, height = rng.uniform(0.1, np.pi / 3 - 0.1, 500), rng.uniform(0.5, 4.5, 500)
+    xout = np.column_stack([6.5 * np.cos(angle), 6.5 * np.sin(angle), height])
+
+    matrix = surface_interpolation_matrix(xin, xout)
+    assert _inside_fraction(matrix) == 1.0
+    np.testing.assert_allclose(matrix.sum(axis=1), 1.0)
+    # values vary linearly along the axis, so only the curvature between neighbors is left as an error
+    np.testing.assert_allclose(matrix @ (2 * xin[:, 2] + 1), 2 * xout[:, 2] + 1, rtol=1e-4)